@@ -1,3 +1,43 @@
-from element import Elements, Molecule, Cation, Anion
-from unit import Reagent, Product
-from sieve import *
+import importlib
+import sys
+from types import ModuleType
+
+# Names are resolved from their submodule on first use, so 'import Chem'
+# costs next to nothing and a program only loads the parts it touches.
+_exports = {
+   "Elements": "element",
+   "Molecule": "element",
+   "Cation": "element",
+   "Anion": "element",
+   "Reagent": "unit",
+   "Product": "unit",
+   "Sieve": "sieve",
+   "SieveBuilder": "sieve",
+   "MoleculeUnit": "sieve",
+   "Moles": "sieve",
+   "Grams": "sieve",
+   "Concentration": "sieve"
+}
+
+__all__ = sorted(_exports)
+
+class _LazyModule(ModuleType):
+   def __getattr__(self, name):
+      try:
+         module = _exports[name]
+      except KeyError:
+         raise AttributeError("module '{0}' has no attribute '{1}'".format(self.__name__, name))
+
+      value = getattr(importlib.import_module("{0}.{1}".format(self.__name__, module)), name)
+      setattr(self, name, value)
+      return value
+
+   def __dir__(self):
+      return sorted(set(self.__dict__) | set(_exports))
+
+_module = _LazyModule(__name__)
+_module.__dict__.update(sys.modules[__name__].__dict__)
+# The original module has to stay referenced, Python 2 clears the globals
+# of a module object once it is collected.
+_module._original = sys.modules[__name__]
+sys.modules[__name__] = _module
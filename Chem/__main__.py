@@ -0,0 +1,77 @@
+from Chem.batch import map_ordered
+from Chem.unit import parse_equation, balance_cache
+import argparse
+import json
+import sys
+
+def species(x):
+   molecule = x.unit.molecule
+   return {"formula": str(molecule), "coefficient": x.unit.ratio, "molar_mass": molecule.mass}
+
+def process(line, method):
+   (number, text) = line
+   record = {"line": number, "input": text}
+
+   try:
+      eq = parse_equation(text).balance(method=method)
+      record["equation"] = str(eq)
+      record["reagents"] = [species(x) for x in eq.reagents]
+      record["products"] = [species(x) for x in eq.products]
+   except Exception as e:
+      # A bad line becomes an error record, the stream carries on.
+      record["error"] = str(e)
+
+   # Records are serialised here too, so nothing about a line can stop the
+   # stream once it has been read.
+   try:
+      return json.dumps(record, sort_keys=True)
+   except Exception as e:
+      return json.dumps({"line": number, "input": repr(text), "error": str(e)}, sort_keys=True)
+
+def lines(files):
+   number = 0
+
+   for name in files or ["-"]:
+      f = sys.stdin if name == "-" else open(name)
+
+      try:
+         for text in f:
+            number += 1
+            # Bytes that are not UTF-8 are replaced rather than failing the
+            # line, the parser then rejects the formula.
+            text = text.decode("utf-8", "replace").encode("utf-8").strip()
+
+            if text and not text.startswith("#"):
+               yield (number, text)
+      finally:
+         if f is not sys.stdin:
+            f.close()
+
+def main(argv=None):
+   parser = argparse.ArgumentParser(prog="python -m Chem", description="Balances reactions such as 'CH4 + O2 -> CO2 + H2O', one per line, and writes one JSON record per line.")
+   parser.add_argument("files", nargs="*", help="files to read, '-' or none for stdin")
+   parser.add_argument("-w", "--workers", type=int, default=1, help="number of worker processes")
+   parser.add_argument("--chunksize", type=int, default=256, help="lines handed to a worker at a time")
+   parser.add_argument("--method", default="nullspace", help="balancing method")
+   parser.add_argument("--store", help="SQLite file to keep balanced coefficients in across runs")
+   args = parser.parse_args(argv)
+
+   if args.store:
+      from Chem.store import BalanceStore
+      balance_cache.store = BalanceStore(args.store)
+
+   # Lines are read, balanced and written as a stream, so memory does not
+   # grow with the size of the input.
+   for record in map_ordered(process, lines(args.files), (args.method,), args.workers, args.chunksize):
+      sys.stdout.write(record)
+      sys.stdout.write("\n")
+
+   sys.stdout.flush()
+
+   if balance_cache.store is not None:
+      balance_cache.store.close()
+
+   return 0
+
+if __name__ == "__main__":
+   sys.exit(main())
@@ -0,0 +1,130 @@
+from element import parse_formula, atomic_weight_vector
+from sieve import MoleculeUnit, Moles, Grams
+from itertools import chain, islice
+import numpy
+
+class ArrayUnit:
+   # Array counterparts of the scalar units. Arithmetic works on whole
+   # arrays at once and broadcasts like NumPy does.
+   _scalar = MoleculeUnit
+
+   def __unwrap(self, x):
+      if isinstance(x, self._scalar):
+         return x.value
+
+      if isinstance(x, MoleculeUnit):
+         raise TypeError("Cannot combine '{0}' with '{1}'".format(self.__class__.__name__, x.__class__.__name__))
+
+      return x
+
+   def __add__(self, x):
+      return self.copy(self.value + self.__unwrap(x))
+
+   def __sub__(self, x):
+      return self.copy(self.value - self.__unwrap(x))
+
+   def __mul__(self, x):
+      return self.copy(self.value * self.__unwrap(x))
+
+   def __div__(self, x):
+      return self.copy(self.value / self.__unwrap(x))
+
+   def __truediv__(self, x):
+      return self.__div__(x)
+
+   def __pow__(self, x):
+      return self.copy(self.value ** self.__unwrap(x))
+
+   def __len__(self):
+      return len(self.value)
+
+   def __getitem__(self, index):
+      value = self.value[index]
+
+      if numpy.ndim(value):
+         return self.copy(value)
+
+      return self._scalar(self.molecule, float(value))
+
+   def __iter__(self):
+      for x in self.value:
+         yield self._scalar(self.molecule, float(x))
+
+   def __repr__(self):
+      return "{0}[{1}](shape={2})".format(self.__class__.__name__, str(self.molecule), self.value.shape)
+
+class MolesArray(ArrayUnit, Moles):
+   _scalar = Moles
+
+   def __init__(self, molecule, amount):
+      Moles.__init__(self, molecule, numpy.asarray(amount, dtype=numpy.float64))
+
+   @property
+   def grams(self):
+      return GramsArray(self.molecule, self.value * self.molecule.mass)
+
+   def to(self, molecule):
+      return MolesArray(molecule, self.value)
+
+   def copy(self, value):
+      return MolesArray(self.molecule, value)
+
+class GramsArray(ArrayUnit, Grams):
+   _scalar = Grams
+
+   def __init__(self, molecule, amount):
+      Grams.__init__(self, molecule, numpy.asarray(amount, dtype=numpy.float64))
+
+   @property
+   def moles(self):
+      return MolesArray(self.molecule, self.value / self.molecule.mass)
+
+   def to(self, molecule):
+      return GramsArray(molecule, self.value)
+
+   def copy(self, value):
+      return GramsArray(self.molecule, value)
+
+def composition_matrix(species):
+   # The sparse species by element count matrix in coordinate form: entry i
+   # says species rows[i] holds counts[i] atoms of element columns[i].
+   compositions = [parse_formula(x).composition if isinstance(x, basestring) else x.composition for x in species]
+   sizes = numpy.fromiter(map(len, compositions), dtype=numpy.int64, count=len(compositions))
+   entries = numpy.fromiter(chain.from_iterable(chain.from_iterable(compositions)), dtype=numpy.int64, count=2 * int(sizes.sum())).reshape(-1, 2)
+   rows = numpy.repeat(numpy.arange(len(compositions)), sizes)
+   return (rows, entries[:, 0], entries[:, 1])
+
+def molar_masses(species, chunksize=65536):
+   # Molar masses of a whole library of molecules, ions or formulas as one
+   # array. Each chunk becomes a composition matrix which is multiplied by
+   # the atomic weights, so memory besides the result stays bounded by the
+   # chunk size.
+   if chunksize <= 0:
+      raise ValueError("'chunksize' cannot be negative or zero")
+
+   weights = atomic_weight_vector()
+   size = len(species) if hasattr(species, "__len__") else None
+   result = numpy.empty(size) if size is not None else []
+   iterator = iter(species)
+   start = 0
+
+   while True:
+      chunk = list(islice(iterator, chunksize))
+
+      if not chunk:
+         break
+
+      (rows, columns, counts) = composition_matrix(chunk)
+      masses = numpy.bincount(rows, weights=counts * weights[columns], minlength=len(chunk))
+
+      if size is None:
+         result.append(masses)
+      else:
+         result[start:start + len(chunk)] = masses
+
+      start += len(chunk)
+
+   if size is None:
+      return numpy.concatenate(result) if result else numpy.empty(0)
+
+   return result
@@ -0,0 +1,67 @@
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+import multiprocessing
+from unit import balance_cache
+
+def _balance(equation, method):
+   try:
+      return equation.balance(method=method)
+   except Exception as e:
+      # Failures are handed back in place of the result, so one bad
+      # reaction never stops the rest of the batch.
+      return e
+
+def _apply_chunk(function, args, items):
+   result = [function(x, *args) for x in items]
+
+   # Pool workers exit without running exit handlers, so results buffered
+   # for the persistent store are written out with every chunk.
+   if balance_cache.store is not None:
+      balance_cache.store.flush()
+
+   return result
+
+def _chunks(iterable, size):
+   iterator = iter(iterable)
+
+   while True:
+      chunk = list(islice(iterator, size))
+
+      if not chunk:
+         return
+
+      yield chunk
+
+def map_ordered(function, items, args=(), workers=None, chunksize=64):
+   # Applies a picklable top level 'function' to every item over a process
+   # pool and yields the results in input order.
+   if chunksize <= 0:
+      raise ValueError("'chunksize' cannot be negative or zero")
+
+   workers = workers or multiprocessing.cpu_count()
+
+   if workers == 1:
+      for x in items:
+         yield function(x, *args)
+      return
+
+   # Only a bounded window of chunks is in flight at any time, so the input
+   # can be a stream far larger than memory and results still come back in
+   # input order.
+   with ProcessPoolExecutor(max_workers=workers) as executor:
+      pending = deque()
+
+      for chunk in _chunks(items, chunksize):
+         pending.append(executor.submit(_apply_chunk, function, args, chunk))
+
+         if len(pending) >= 2 * workers:
+            for x in pending.popleft().result():
+               yield x
+
+      while pending:
+         for x in pending.popleft().result():
+            yield x
+
+def balance_many(equations, workers=None, chunksize=64, method="nullspace"):
+   return map_ordered(_balance, equations, (method,), workers, chunksize)
@@ -0,0 +1,237 @@
+from Chem.element import Elements, Molecule, ElementMolecule, KnownElement, parse_formula, _parse_formula
+from Chem.unit import Reagent, Product, balance_cache
+from Chem.sieve import Sieve, SieveBuilder, Moles
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import timeit
+
+Baseline = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmarks.json")
+
+# Absolute limits in seconds, checked on every run whatever the baseline
+# says, so short-lived tools keep starting fast.
+Budgets = {
+   "import.chem": 0.005,
+   "import.first_molecule": 0.03
+}
+
+ImportProbe = """
+import time
+start = time.time()
+import Chem
+imported = time.time()
+Chem.Molecule("H2O")
+print("{0} {1}".format(imported - start, time.time() - start))
+"""
+
+# Every family is a function of its size parameter returning a callable to
+# time, so the cost can be followed as the size grows.
+Families = {}
+
+def family(name, sizes):
+   def register(f):
+      Families[name] = (sizes, f)
+      return f
+
+   return register
+
+def alkane(n):
+   return "C{0}H{1}".format(n, 2 * n + 2)
+
+def combustion(n, scale=1):
+   return Reagent(Molecule(alkane(n)), 2 * scale) + Reagent(Molecule("O2"), (3 * n + 1) * scale) == Product(Molecule("CO2"), 2 * n * scale) + Product(Molecule("H2O"), (2 * n + 2) * scale)
+
+@family("molecule.parse", (1, 10, 100, 1000))
+def bench_parse(n):
+   formula = alkane(n)
+   return lambda: _parse_formula(formula)
+
+@family("molecule.parse_cached", (1, 10, 100, 1000))
+def bench_parse_cached(n):
+   formula = alkane(n)
+   parse_formula(formula)
+   return lambda: parse_formula(formula)
+
+@family("molecule.elements", (1, 10, 100, 1000))
+def bench_elements(n):
+   atoms = [Elements["C"]] * n + [Elements["H"]] * (2 * n + 2)
+   return lambda: Molecule(*atoms)
+
+@family("molecule.mass", (1, 10, 100, 1000))
+def bench_mass(n):
+   counts = [(Elements["C"], n), (Elements["H"], 2 * n + 2)]
+   return lambda: ElementMolecule.from_counts(counts).mass
+
+@family("molecule.eq", (1, 10, 100, 1000))
+def bench_eq(n):
+   (a, b) = (_parse_formula(alkane(n)), _parse_formula(alkane(n)))
+   return lambda: a == b
+
+@family("molecule.hash", (1, 10, 100, 1000))
+def bench_hash(n):
+   a = _parse_formula(alkane(n))
+   return lambda: hash(a)
+
+@family("equation.balance", (1, 5, 20, 60))
+def bench_balance(n):
+   eq = Reagent(Molecule(alkane(n))) + Reagent(Molecule("O2")) == Product(Molecule("CO2")) + Product(Molecule("H2O"))
+
+   def run():
+      balance_cache.clear()
+      return eq.balance()
+
+   return run
+
+@family("equation.balance_cached", (1, 5, 20, 60))
+def bench_balance_cached(n):
+   eq = Reagent(Molecule(alkane(n))) + Reagent(Molecule("O2")) == Product(Molecule("CO2")) + Product(Molecule("H2O"))
+   eq.balance()
+   return eq.balance
+
+@family("equation.check", (1, 1000, 1000000))
+def bench_check(n):
+   eq = combustion(8, n)
+   return lambda: bool(eq)
+
+@family("sieve.lookup", (2, 10, 50))
+def bench_sieve(n):
+   # One reagent made of n elements falling apart into n single atoms.
+   atoms = [KnownElement(z) for z in range(1, n + 1)]
+   products = [Product(Molecule(x)) for x in atoms]
+   eq = Reagent(Molecule(*atoms)) == reduce(lambda x, y: x + y, products)
+   s = Sieve(eq, 1.0, Moles(Molecule(*atoms), 1.0))
+   species = [x.unit.molecule for x in products]
+
+   def run():
+      for x in species:
+         s[x]
+
+   return run
+
+@family("sieve.build", (10, 100, 1000))
+def bench_sieve_build(n):
+   # n dosing events into the same vessel, then one snapshot.
+   eq = Reagent(Molecule("NaOH")) + Reagent(Molecule("HCl")) == Product(Molecule("NaCl")) + Product(Molecule("H2O"))
+   dose = Moles(Molecule("NaOH"), 0.001)
+
+   def run():
+      builder = SieveBuilder(eq, 1.0)
+
+      for i in range(0, n):
+         builder.add(dose)
+
+      return builder.freeze()
+
+   return run
+
+def measure(f, repeat=5, budget=0.05):
+   # Grow the loop count until one run takes long enough to time reliably,
+   # then keep the best of several runs.
+   number = 1
+
+   while True:
+      elapsed = timeit.timeit(f, number=number)
+
+      if elapsed >= budget or number >= 10 ** 7:
+         break
+
+      number *= 10
+
+   return min(timeit.repeat(f, number=number, repeat=repeat)) / number
+
+def measure_import(repeat=5):
+   # Each probe runs in a fresh interpreter, since a module is only ever
+   # imported once per process.
+   root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+   timings = []
+
+   for i in range(0, repeat):
+      output = subprocess.check_output([sys.executable, "-c", ImportProbe], cwd=root)
+      timings.append([float(x) for x in output.split()])
+
+   return {"import.chem": min(x[0] for x in timings), "import.first_molecule": min(x[1] for x in timings)}
+
+def run(names=None, repeat=5):
+   results = {}
+
+   if not names or any(x in k for x in names for k in Budgets):
+      for (key, value) in sorted(measure_import(repeat).items()):
+         results[key] = value
+         sys.stderr.write("{0:<36} {1:.3e} s\n".format(key, value))
+
+   for name in sorted(Families):
+      if names and not any(x in name for x in names):
+         continue
+
+      (sizes, f) = Families[name]
+
+      for n in sizes:
+         key = "{0}[{1}]".format(name, n)
+         results[key] = measure(f(n), repeat=repeat)
+         sys.stderr.write("{0:<36} {1:.3e} s\n".format(key, results[key]))
+
+   return results
+
+def compare(results, baseline, tolerance):
+   # Cases missing from the baseline are reported with no reference, a new
+   # family must come with a refreshed baseline to be checked at all.
+   regressions = []
+
+   for (key, value) in sorted(results.items()):
+      reference = baseline.get(key)
+
+      if reference is None or value > reference * (1 + tolerance):
+         regressions.append((key, reference, value))
+
+   return regressions
+
+def main(argv=None):
+   parser = argparse.ArgumentParser(prog="python -m Chem.benchmarks", description="Runs the Chem benchmark families.")
+   parser.add_argument("-k", dest="names", action="append", help="only run families whose name contains this")
+   parser.add_argument("-o", "--output", help="write the results as JSON to this file")
+   parser.add_argument("--baseline", default=Baseline, help="baseline JSON to compare against")
+   parser.add_argument("--save-baseline", action="store_true", help="store the results as the new baseline")
+   parser.add_argument("--tolerance", type=float, default=1.0, help="allowed slowdown relative to the baseline, 1.0 means twice as slow")
+   parser.add_argument("--repeat", type=int, default=5)
+   args = parser.parse_args(argv)
+
+   results = run(args.names, args.repeat)
+   document = {"python": platform.python_version(), "machine": platform.machine(), "results": results}
+
+   if args.output:
+      with open(args.output, "w") as f:
+         json.dump(document, f, indent=1, sort_keys=True, separators=(",", ": "))
+
+   over = [(k, v, Budgets[k]) for (k, v) in sorted(results.items()) if k in Budgets and v > Budgets[k]]
+
+   for (key, value, budget) in over:
+      sys.stderr.write("OVER BUDGET {0}: {1:.3e} s, budget is {2:.3e} s\n".format(key, value, budget))
+
+   if args.save_baseline:
+      with open(args.baseline, "w") as f:
+         json.dump(document, f, indent=1, sort_keys=True, separators=(",", ": "))
+
+      return 1 if over else 0
+
+   if not os.path.exists(args.baseline):
+      sys.stderr.write("No baseline at '{0}', nothing to compare against\n".format(args.baseline))
+      return 1 if over else 0
+
+   with open(args.baseline) as f:
+      baseline = json.load(f)["results"]
+
+   regressions = compare(results, baseline, args.tolerance)
+
+   for (key, reference, value) in regressions:
+      if reference is None:
+         sys.stderr.write("NO BASELINE {0}: {1:.3e} s, refresh it with --save-baseline\n".format(key, value))
+      else:
+         sys.stderr.write("REGRESSION {0}: {1:.3e} s -> {2:.3e} s ({3:.1f}x)\n".format(key, reference, value, value / reference))
+
+   return 1 if regressions or over else 0
+
+if __name__ == "__main__":
+   sys.exit(main())
@@ -0,0 +1,159 @@
+from element import ElementMolecule, KnownElement, Molecule, Cation, Anion
+from unit import Reagent, Product, CompoundReagent, CompoundProduct, Equation, make_side
+from sieve import Sieve
+from array import array
+import struct
+import sys
+
+# A checkpoint is a small header, a table of the species as element counts,
+# the equation as coefficients into that table, and the amounts of the sieve
+# as one float64 block, so loading parses no formula and balances nothing.
+Magic = b"CHSV"
+Version = 1
+
+Header = struct.Struct("<4sBdHHHhB")
+Species = struct.Struct("<bH")
+Count = struct.Struct("<BI")
+Unit = struct.Struct("<BHI")
+Dimension = struct.Struct("<I")
+
+def _write_species(out, x):
+   molecule = x.molecule if x.charge else x
+   (composition, order) = molecule.__getstate__()
+   counts = dict(composition)
+   out.append(Species.pack(x.charge, len(order)))
+   out.extend(Count.pack(z, counts[z]) for z in order)
+
+def _read_species(data, offset):
+   (charge, n) = Species.unpack_from(data, offset)
+   offset += Species.size
+   pairs = []
+
+   for i in range(0, n):
+      (z, count) = Count.unpack_from(data, offset)
+      offset += Count.size
+      pairs.append((KnownElement(z), count))
+
+   molecule = ElementMolecule.from_counts(pairs)
+
+   if charge > 0:
+      molecule = Cation(molecule, charge=charge)
+   elif charge < 0:
+      molecule = Anion(molecule, charge=-charge)
+
+   return (Molecule(molecule), offset)
+
+def _payload(values):
+   # Plain amounts go through the array module, amounts that are arrays need
+   # NumPy and are broadcast to one common shape.
+   if not any(hasattr(x, "shape") and x.shape for x in values):
+      return ((), array("d", [float(x) for x in values]))
+
+   import numpy
+   shape = numpy.broadcast(*values).shape if len(values) > 1 else numpy.shape(values[0])
+   block = numpy.empty((len(values),) + shape, dtype="<f8")
+
+   for (i, x) in enumerate(values):
+      block[i] = x
+
+   return (shape, block)
+
+def dumps(sieve):
+   size = sieve.size
+
+   if hasattr(size, "shape") and size.shape:
+      raise ValueError("Only sieves of a single size can be checkpointed")
+
+   equation = sieve.equation
+   units = [(0, x) for x in equation.reagents] + [(1, x) for x in equation.products]
+   amounts = list(sieve.amounts().items())
+
+   species = []
+   index = {}
+
+   for x in [x.unit.molecule for (side, x) in units] + [k for (k, v) in amounts]:
+      if x not in index:
+         index[x] = len(species)
+         species.append(x)
+
+   (shape, block) = _payload([v for (k, v) in amounts])
+   reference = index[sieve.reference] if sieve.reference is not None else -1
+   out = [Header.pack(Magic, Version, float(size), len(species), len(units), len(amounts), reference, len(shape))]
+
+   for x in species:
+      _write_species(out, x)
+
+   for (side, x) in units:
+      ratio = x.unit.ratio
+
+      if ratio != int(ratio):
+         raise ValueError("Coefficient '{0}' of '{1}' is not an integer".format(ratio, str(x)))
+
+      out.append(Unit.pack(side, index[x.unit.molecule], int(ratio)))
+
+   out.extend(Dimension.pack(n) for n in shape)
+   out.append(struct.pack("<{0}H".format(len(amounts)), *[index[k] for (k, v) in amounts]))
+
+   if isinstance(block, array) and sys.byteorder != "little":
+      block.byteswap()
+
+   out.append(block.tostring())
+
+   return b"".join(out)
+
+def loads(data):
+   try:
+      (magic, version, size, nspecies, nunits, namounts, reference, ndim) = Header.unpack_from(data, 0)
+   except struct.error:
+      raise ValueError("Truncated checkpoint")
+
+   if magic != Magic:
+      raise ValueError("Not a sieve checkpoint")
+
+   if version != Version:
+      raise ValueError("Unsupported checkpoint version '{0}'".format(version))
+
+   try:
+      offset = Header.size
+      species = []
+
+      for i in range(0, nspecies):
+         (x, offset) = _read_species(data, offset)
+         species.append(x)
+
+      sides = ([], [])
+
+      for i in range(0, nunits):
+         (side, j, ratio) = Unit.unpack_from(data, offset)
+         offset += Unit.size
+         sides[side].append((Reagent, Product)[side](species[j], ratio))
+
+      shape = struct.unpack_from("<{0}I".format(ndim), data, offset)
+      offset += Dimension.size * ndim
+      keys = struct.unpack_from("<{0}H".format(namounts), data, offset)
+      offset += 2 * namounts
+
+      if ndim:
+         import numpy
+         values = numpy.frombuffer(data, dtype="<f8", count=namounts * int(numpy.prod(shape)), offset=offset).reshape((namounts,) + shape).astype(numpy.float64)
+      else:
+         values = array("d")
+         values.fromstring(data[offset:offset + 8 * namounts])
+
+         if sys.byteorder != "little":
+            values.byteswap()
+   except (struct.error, IndexError, ValueError):
+      raise ValueError("Truncated checkpoint")
+
+   if len(values) != namounts:
+      raise ValueError("Truncated checkpoint")
+
+   equation = Equation(make_side(CompoundReagent, sides[0]), make_side(CompoundProduct, sides[1]))
+   amounts = dict((species[k], values[i]) for (i, k) in enumerate(keys))
+   return Sieve._from_amounts(equation, size, amounts, species[reference] if reference >= 0 else None)
+
+def dump(sieve, f):
+   f.write(dumps(sieve))
+
+def load(f):
+   return loads(f.read())
@@ -1,6 +1,13 @@
-from itertools import izip_longest, chain
+from itertools import chain
+from collections import OrderedDict
+import re
+import weakref
+from array import array
+from stats import instrumentation
+
+class Element(object):
+   __slots__ = ()
 
-class Element:
    def __init__(self):
       raise NotImplementedError()
 
@@ -10,8 +17,23 @@ class Element:
       yield self
 
 class KnownElement(Element):
+   # There is exactly one instance per atomic number, and all of its data
+   # is read from the arrays indexed by Z below.
+   __slots__ = ("__z",)
+
+   __instances = {}
+
+   def __new__(cls, z):
+      try:
+         return cls.__instances[z]
+      except KeyError:
+         return cls.__instances.setdefault(z, Element.__new__(cls))
+
    def __init__(self, z):
       self.__z = z
+
+   def __reduce__(self):
+      return (KnownElement, (self.__z,))
       
    @property
    def Z(self):
@@ -19,7 +41,19 @@ class KnownElement(Element):
    
    @property
    def mass(self):
-      return PeriodicTable[self.Z]["AtomicWeight"]
+      return AtomicWeights[self.__z]
+
+   @property
+   def symbol(self):
+      return Symbols[self.__z]
+
+   @property
+   def group(self):
+      return Groups[self.__z]
+
+   @property
+   def period(self):
+      return Periods[self.__z]
 
    def __hash__(self):
       return hash(self.Z)
@@ -55,10 +89,10 @@ class KnownElement(Element):
       return NotImplemented   
    
    def __str__(self):
-      try:
-         return PeriodicTable[self.Z]["Symbol"]
-      except KeyError:
-         return "Z({0})".format(self.Z)
+      if 0 < self.__z < len(Symbols):
+         return Symbols[self.__z]
+
+      return "Z({0})".format(self.Z)
 
    def __repr__(self):
       return str(self)
@@ -66,61 +100,339 @@ class KnownElement(Element):
 def Molecule(*args):
    if not args:
       raise ValueError("Expected elements or a molecule")
+
+   if len(args) == 1 and isinstance(args[0], basestring):
+      return Interned.intern(parse_formula(args[0]))
    
    args = list(args)
    
    for x in args:
       if not isinstance(x, Element):
          if len(args) == 1 and (isinstance(x, ElementMolecule) or isinstance(x, Ion)):
-            return x
+            return Interned.intern(x)
 
          raise ValueError("Got '{0}' but expected Element".format(str(x)))
 
-   return ElementMolecule(*args)
+   return Interned.intern(ElementMolecule(*args))
+
+class InternTable(object):
+   # Resolves molecules and ions with the same composition to one shared
+   # instance. Values are held weakly, so species nobody refers to anymore
+   # drop out of the table on their own.
+   def __init__(self, enabled=False):
+      self.__enabled = enabled
+      self.__table = weakref.WeakValueDictionary()
+      self.__hits = 0
+      self.__misses = 0
+
+   @property
+   def enabled(self):
+      return self.__enabled
+
+   @enabled.setter
+   def enabled(self, enabled):
+      self.__enabled = enabled
+
+   @property
+   def hits(self):
+      return self.__hits
+
+   @property
+   def misses(self):
+      return self.__misses
+
+   def intern(self, x):
+      if not self.__enabled:
+         return x
+
+      key = (x.__class__, x.composition, x.charge)
+      y = self.__table.get(key)
+
+      if y is not None:
+         self.__hits += 1
+
+         if instrumentation.enabled:
+            instrumentation.count("intern.hits")
+
+         return y
+
+      self.__misses += 1
+
+      if instrumentation.enabled:
+         instrumentation.count("intern.misses")
+      self.__table[key] = x
+      return x
+
+   def clear(self):
+      self.__table.clear()
+      self.__hits = 0
+      self.__misses = 0
+
+   def __len__(self):
+      return len(self.__table)
+
+   def __repr__(self):
+      return "InternTable({0}, hits={1}, misses={2})".format(len(self), self.hits, self.misses)
+
+Interned = InternTable()
+
+FormulaCacheSize = 65536
+
+_formula_cache = OrderedDict()
+_formula_patterns = None
+
+def _formula_grammar():
+   # Compiled on the first parse instead of at import, so programs that
+   # never parse a formula don't pay for it.
+   global _formula_patterns
+
+   if _formula_patterns is None:
+      _formula_patterns = (
+         re.compile(r"([A-Z][a-z]*)(\d*)|([(\[])|([)\]])(\d*)"),
+         # A charge count goes after a caret or after the sign, "SO4^2-" or
+         # "Fe+3". Digits right before a bare sign are an atom count, so
+         # "NH4+" is NH4 with one charge, and every repeated sign counts one.
+         re.compile(r"(?:\^(\d*)([+-])|([+-])(\d+)|([+-]+))$"),
+         re.compile(u"\xc2\xb7|[*.\u00b7]"),
+         re.compile(r"\d*")
+      )
+
+   return _formula_patterns
+
+def parse_formula(formula):
+   # Molecules are immutable, so the same instance is handed out for
+   # a formula seen before.
+   try:
+      molecule = _formula_cache[formula]
+   except KeyError:
+      pass
+   else:
+      if instrumentation.enabled:
+         instrumentation.count("formula_cache.hits")
+
+      return molecule
+
+   if instrumentation.enabled:
+      instrumentation.count("formula_cache.misses")
+
+   molecule = _parse_formula(formula)
+
+   if len(_formula_cache) >= FormulaCacheSize:
+      _formula_cache.popitem(last=False)
+
+   _formula_cache[formula] = molecule
+   return molecule
+
+def _parse_formula(formula):
+   (token, suffix, hydrate, prefix) = _formula_grammar()
+   source = formula
+   formula = formula.strip()
+   charge = 0
+   match = suffix.search(formula)
+
+   if match:
+      (digits, sign, leading, trailing, signs) = match.groups()
+
+      if leading:
+         charge = int(trailing) if leading == "+" else -int(trailing)
+      elif signs:
+         if signs != signs[0] * len(signs):
+            raise ValueError("Invalid charge in formula '{0}'".format(source))
+
+         charge = len(signs) if signs[0] == "+" else -len(signs)
+      else:
+         charge = int(digits or 1) if sign == "+" else -int(digits or 1)
+
+      formula = formula[:match.start()]
+
+   counts = []
+
+   # Hydrates such as "CuSO4.5H2O" are parts joined by a dot, each with
+   # an optional leading multiplier.
+   for part in hydrate.split(formula):
+      digits = prefix.match(part).group()
+      multiplier = int(digits or 1)
+      counts.extend((x, n * multiplier) for (x, n) in _expand_formula(token, part[len(digits):], source))
+
+   molecule = ElementMolecule.from_counts(counts)
+
+   if not molecule.composition:
+      raise ValueError("Formula '{0}' has no elements".format(source))
+
+   if charge > 0:
+      return Cation(molecule, charge=charge)
+
+   if charge < 0:
+      return Anion(molecule, charge=-charge)
+
+   return molecule
+
+def _expand_formula(token, formula, source):
+   stack = [[]]
+   position = 0
+
+   for match in token.finditer(formula):
+      if match.start() != position:
+         break
+
+      position = match.end()
+      (symbol, count, opening, closing, multiplier) = match.groups()
+
+      if symbol:
+         try:
+            stack[-1].append((Elements[symbol], int(count or 1)))
+         except KeyError:
+            raise ValueError("Unknown element '{0}' in formula '{1}'".format(symbol, source))
+      elif opening:
+         stack.append([])
+      elif len(stack) > 1:
+         group = stack.pop()
+         multiplier = int(multiplier or 1)
+         stack[-1].extend((x, n * multiplier) for (x, n) in group)
+      else:
+         raise ValueError("Unbalanced parentheses in formula '{0}'".format(source))
+
+   if position != len(formula):
+      raise ValueError("Unexpected '{0}' in formula '{1}'".format(formula[position:], source))
+
+   if len(stack) != 1:
+      raise ValueError("Unbalanced parentheses in formula '{0}'".format(source))
+
+   return stack[0]
+
+class ElementMolecule(object):
+   # A molecule is kept as its sorted (Z, count) composition instead of one
+   # reference per atom, so size, hashing and comparison only depend on the
+   # number of distinct elements.
+   __slots__ = ("__composition", "__order", "__hash", "__mass", "__weakref__")
 
-class ElementMolecule:
    def __init__(self, *elements):
-      self.__elements = list(elements)
+      self.__assign((x, 1) for x in elements)
+
+   @classmethod
+   def from_counts(cls, pairs):
+      molecule = cls.__new__(cls)
+      molecule.__assign(pairs)
+      return molecule
+
+   def __assign(self, pairs):
+      counts = {}
+      order = []
+
+      for (x, n) in pairs:
+         z = x.Z
+
+         if z in counts:
+            counts[z] += n
+         else:
+            counts[z] = n
+            order.append(z)
+
+      self.__composition = tuple(sorted((z, n) for (z, n) in counts.items() if n))
+      self.__order = tuple(z for z in order if counts[z])
+      self.__hash = hash(self.__composition)
+      self.__mass = None
+
+   @property
+   def composition(self):
+      return self.__composition
+
+   @property
+   def charge(self):
+      return 0
 
    @property
    def mass(self):
-      return sum(x.mass for x in self)
+      if self.__mass is None:
+         self.__mass = sum(AtomicWeights[z] * n for (z, n) in self.__composition)
+
+      return self.__mass
 
    def __eq__(self, x):
-      for (x, y) in izip_longest(self, x):
-         if not x or not y or x != y:
-            return False
-      
-      return True
+      if self is x:
+         return True
+
+      if isinstance(x, ElementMolecule):
+         return self.__hash == x.__hash and self.__composition == x.__composition
+
+      return NotImplemented
+
+   def __ne__(self, x):
+      result = self.__eq__(x)
+      return result if result is NotImplemented else not result
 
    def __hash__(self):
-      return hash(tuple(self.__elements))
+      return self.__hash
 
    def __iter__(self):
-      return iter(self.__elements)
+      for (z, n) in self.__composition:
+         element = KnownElement(z)
+
+         for i in range(0, n):
+            yield element
+
+   def __getstate__(self):
+      return (self.__composition, self.__order)
+
+   def __setstate__(self, state):
+      (self.__composition, self.__order) = state
+      self.__hash = hash(self.__composition)
+      self.__mass = None
       
    def __str__(self):
-      return "".join(map(str, self))
+      counts = dict(self.__composition)
+      return "".join("{0}{1}".format(str(KnownElement(z)), counts[z] if counts[z] != 1 else "") for z in self.__order)
 
    def __repr__(self):
       return self.__str__()
 
 class Ion:
-   def __init__(self, *molecule):
+   def __init__(self, *molecule, **kwargs):
+      charge = kwargs.pop("charge", 0)
+
+      if kwargs:
+         raise TypeError("Unexpected argument '{0}'".format(sorted(kwargs)[0]))
+
       self.__molecule = Molecule(*molecule)
+      self.__charge = charge
 
    @property
    def molecule(self):
       return self.__molecule
+
+   @property
+   def composition(self):
+      return self.__molecule.composition
+
+   @property
+   def charge(self):
+      return self.__charge
+
+   @property
+   def mass(self):
+      return self.__molecule.mass
       
    def __iter__(self):
       return iter(self.__molecule)
 
    def __hash__(self):
-      return hash(self.__molecule)
+      return hash(self.__molecule) ^ hash(self.__charge)
       
    def __eq__(self, x):
-      return isinstance(x, self.__class__) and x.molecule == self.molecule
+      return self is x or (isinstance(x, self.__class__) and x.charge == self.charge and x.molecule == self.molecule)
+
+   def __ne__(self, x):
+      return not self.__eq__(x)
+
+   def _charged(self, text, symbol):
+      # "NH4+" for a single charge, "Fe^3+" otherwise. The caret keeps the
+      # charge apart from a trailing count, as in "SO4^2-".
+      n = abs(self.__charge)
+
+      if n == 1:
+         return text + symbol
+
+      return "{0}^{1}{2}".format(text, n, symbol)
 
    def __str__(self):
       return str(self.__molecule)
@@ -130,150 +442,34 @@ class Ion:
       
 class Cation(Ion):
    def __init__(self, *args, **kwargs):
-      Ion.__init__(self, *args, **kwargs)
+      charge = kwargs.pop("charge", 1)
 
-   def __hash__(self):
-      return Ion.__hash__(self) ^ hash("+")
+      if not isinstance(charge, (int, long)) or charge <= 0:
+         raise ValueError("Charge of a cation must be a positive integer, got '{0}'".format(charge))
+
+      Ion.__init__(self, *args, charge=charge, **kwargs)
 
    def __str__(self):
-      return Ion.__str__(self) + "+"
+      return self._charged(Ion.__str__(self), "+")
       
    def __repr__(self):
-      return Ion.__repr__(self) + "+"
+      return self._charged(Ion.__repr__(self), "+")
 
 class Anion(Ion):
+   # The charge is given as its magnitude, Anion(SO4, charge=2) is SO4^2-.
    def __init__(self, *args, **kwargs):
-      Ion.__init__(self, *args, **kwargs)
+      charge = kwargs.pop("charge", 1)
 
-   def __hash__(self):
-      return Ion.__hash__(self) ^ hash("-")
+      if not isinstance(charge, (int, long)) or charge <= 0:
+         raise ValueError("Charge of an anion must be a positive integer, got '{0}'".format(charge))
+
+      Ion.__init__(self, *args, charge=-charge, **kwargs)
 
    def __str__(self):
-      return Ion.__str__(self) + "-"
+      return self._charged(Ion.__str__(self), "-")
       
    def __repr__(self):
-      return Ion.__repr__(self) + "-"
-
-Elements = {
-   "H": KnownElement(1),
-   "He": KnownElement(2),
-   "Li": KnownElement(3),
-   "Be": KnownElement(4),
-   "B": KnownElement(5),
-   "C": KnownElement(6),
-   "N": KnownElement(7),
-   "O": KnownElement(8),
-   "F": KnownElement(9),
-   "Ne": KnownElement(10),
-   "Na": KnownElement(11),
-   "Mg": KnownElement(12),
-   "Al": KnownElement(13),
-   "Si": KnownElement(14),
-   "P": KnownElement(15),
-   "S": KnownElement(16),
-   "Cl": KnownElement(17),
-   "Ar": KnownElement(18),
-   "K": KnownElement(19),
-   "Ca": KnownElement(20),
-   "Sc": KnownElement(21),
-   "Ti": KnownElement(22),
-   "V": KnownElement(23),
-   "Cr": KnownElement(24),
-   "Mn": KnownElement(25),
-   "Fe": KnownElement(26),
-   "Co": KnownElement(27),
-   "Ni": KnownElement(28),
-   "Cu": KnownElement(29),
-   "Zn": KnownElement(30),
-   "Ga": KnownElement(31),
-   "Ge": KnownElement(32),
-   "As": KnownElement(33),
-   "Se": KnownElement(34),
-   "Br": KnownElement(35),
-   "Kr": KnownElement(36),
-   "Rb": KnownElement(37),
-   "Sr": KnownElement(38),
-   "Y": KnownElement(39),
-   "Zr": KnownElement(40),
-   "Nb": KnownElement(41),
-   "Mo": KnownElement(42),
-   "Tc": KnownElement(43),
-   "Ru": KnownElement(44),
-   "Rh": KnownElement(45),
-   "Pd": KnownElement(46),
-   "Ag": KnownElement(47),
-   "Cd": KnownElement(48),
-   "In": KnownElement(49),
-   "Sn": KnownElement(50),
-   "Sb": KnownElement(51),
-   "Te": KnownElement(52),
-   "I": KnownElement(53),
-   "Xe": KnownElement(54),
-   "Cs": KnownElement(55),
-   "Ba": KnownElement(56),
-   "La": KnownElement(57),
-   "Ce": KnownElement(58),
-   "Pr": KnownElement(59),
-   "Nd": KnownElement(60),
-   "Pm": KnownElement(61),
-   "Sm": KnownElement(62),
-   "Eu": KnownElement(63),
-   "Gd": KnownElement(64),
-   "Tb": KnownElement(65),
-   "Dy": KnownElement(66),
-   "Ho": KnownElement(67),
-   "Er": KnownElement(68),
-   "Tm": KnownElement(69),
-   "Yb": KnownElement(70),
-   "Lu": KnownElement(71),
-   "Hf": KnownElement(72),
-   "Ta": KnownElement(73),
-   "W": KnownElement(74),
-   "Re": KnownElement(75),
-   "Os": KnownElement(76),
-   "Ir": KnownElement(77),
-   "Pt": KnownElement(78),
-   "Au": KnownElement(79),
-   "Hg": KnownElement(80),
-   "Tl": KnownElement(81),
-   "Pb": KnownElement(82),
-   "Bi": KnownElement(83),
-   "Po": KnownElement(84),
-   "At": KnownElement(85),
-   "Rn": KnownElement(86),
-   "Fr": KnownElement(87),
-   "Ra": KnownElement(88),
-   "Ac": KnownElement(89),
-   "Th": KnownElement(90),
-   "Pa": KnownElement(91),
-   "U": KnownElement(92),
-   "Np": KnownElement(93),
-   "Pu": KnownElement(94),
-   "Am": KnownElement(95),
-   "Cm": KnownElement(96),
-   "Bk": KnownElement(97),
-   "Cf": KnownElement(98),
-   "Es": KnownElement(99),
-   "Fm": KnownElement(100),
-   "Md": KnownElement(101),
-   "No": KnownElement(102),
-   "Lr": KnownElement(103),
-   "Rf": KnownElement(104),
-   "Db": KnownElement(105),
-   "Sg": KnownElement(106),
-   "Bh": KnownElement(107),
-   "Hs": KnownElement(108),
-   "Mt": KnownElement(109),
-   "Ds": KnownElement(110),
-   "Rg": KnownElement(111),
-   "Cn": KnownElement(112),
-   "Uut": KnownElement(113),
-   "Fl": KnownElement(114),
-   "Uup": KnownElement(115),
-   "Lv": KnownElement(116),
-   "Uus": KnownElement(117),
-   "Uuo": KnownElement(118)
-}
+      return self._charged(Ion.__repr__(self), "-")
 
 PeriodicTable = {
    1: {"Symbol": "H", "Group": 1, "Period": 1, "AtomicWeight": 1.008},
@@ -395,3 +591,115 @@ PeriodicTable = {
    117: {"Symbol": "Uus", "Group": 17, "Period": 7, "AtomicWeight": 294},
    118: {"Symbol": "Uuo", "Group": 18, "Period": 7, "AtomicWeight": 294}
 }
+
+# Stable isotopes of every element that has any, plus the long lived ones
+# of Bi, Th, Pa and U, as (mass number, exact mass, natural abundance), by
+# Z. Elements left out have no isotope pattern.
+Isotopes = {
+   1: ((1, 1.00782503207, 0.999885), (2, 2.0141017778, 0.000115)),
+   2: ((3, 3.0160293191, 0.00000134), (4, 4.00260325415, 0.99999866)),
+   3: ((6, 6.015122795, 0.0759), (7, 7.01600455, 0.9241)),
+   4: ((9, 9.0121822, 1.0),),
+   5: ((10, 10.0129370, 0.199), (11, 11.0093054, 0.801)),
+   6: ((12, 12.0, 0.9893), (13, 13.0033548378, 0.0107)),
+   7: ((14, 14.0030740048, 0.99636), (15, 15.0001088982, 0.00364)),
+   8: ((16, 15.99491461956, 0.99757), (17, 16.99913170, 0.00038), (18, 17.9991610, 0.00205)),
+   9: ((19, 18.99840322, 1.0),),
+   10: ((20, 19.9924401754, 0.9048), (21, 20.99384668, 0.0027), (22, 21.991385114, 0.0925)),
+   11: ((23, 22.9897692809, 1.0),),
+   12: ((24, 23.985041700, 0.7899), (25, 24.98583692, 0.1000), (26, 25.982592929, 0.1101)),
+   13: ((27, 26.98153863, 1.0),),
+   14: ((28, 27.9769265325, 0.92223), (29, 28.976494700, 0.04685), (30, 29.97377017, 0.03092)),
+   15: ((31, 30.97376163, 1.0),),
+   16: ((32, 31.97207100, 0.9499), (33, 32.97145876, 0.0075), (34, 33.96786690, 0.0425), (36, 35.96708076, 0.0001)),
+   17: ((35, 34.96885268, 0.7576), (37, 36.96590259, 0.2424)),
+   18: ((36, 35.967545106, 0.003365), (38, 37.9627324, 0.000632), (40, 39.9623831225, 0.996003)),
+   19: ((39, 38.96370668, 0.932581), (40, 39.96399848, 0.000117), (41, 40.96182576, 0.067302)),
+   20: ((40, 39.96259098, 0.96941), (42, 41.95861801, 0.00647), (43, 42.9587666, 0.00135), (44, 43.9554818, 0.02086), (46, 45.9536926, 0.00004), (48, 47.952534, 0.00187)),
+   21: ((45, 44.9559119, 1.0),),
+   22: ((46, 45.9526316, 0.0825), (47, 46.9517631, 0.0744), (48, 47.9479463, 0.7372), (49, 48.9478700, 0.0541), (50, 49.9447912, 0.0518)),
+   23: ((50, 49.9471585, 0.00250), (51, 50.9439595, 0.99750)),
+   24: ((50, 49.9460442, 0.04345), (52, 51.9405075, 0.83789), (53, 52.9406494, 0.09501), (54, 53.9388804, 0.02365)),
+   25: ((55, 54.9380451, 1.0),),
+   26: ((54, 53.9396105, 0.05845), (56, 55.9349375, 0.91754), (57, 56.9353940, 0.02119), (58, 57.9332756, 0.00282)),
+   27: ((59, 58.9331950, 1.0),),
+   28: ((58, 57.9353429, 0.680769), (60, 59.9307864, 0.262231), (61, 60.9310560, 0.011399), (62, 61.9283451, 0.036345), (64, 63.9279660, 0.009256)),
+   29: ((63, 62.9295975, 0.6915), (65, 64.9277895, 0.3085)),
+   30: ((64, 63.9291422, 0.4917), (66, 65.9260334, 0.2773), (67, 66.9271273, 0.0404), (68, 67.9248442, 0.1845), (70, 69.9253193, 0.0061)),
+   31: ((69, 68.9255736, 0.60108), (71, 70.9247013, 0.39892)),
+   32: ((70, 69.9242474, 0.2038), (72, 71.9220758, 0.2731), (73, 72.9234589, 0.0776), (74, 73.9211778, 0.3672), (76, 75.9214026, 0.0783)),
+   33: ((75, 74.9215965, 1.0),),
+   34: ((74, 73.9224764, 0.0089), (76, 75.9192136, 0.0937), (77, 76.9199140, 0.0763), (78, 77.9173091, 0.2377), (80, 79.9165213, 0.4961), (82, 81.9166994, 0.0873)),
+   35: ((79, 78.9183371, 0.5069), (81, 80.9162906, 0.4931)),
+   36: ((78, 77.9203648, 0.00355), (80, 79.9163790, 0.02286), (82, 81.9134836, 0.11593), (83, 82.914136, 0.11500), (84, 83.911507, 0.56987), (86, 85.91061073, 0.17279)),
+   37: ((85, 84.911789738, 0.7217), (87, 86.909180527, 0.2783)),
+   38: ((84, 83.913425, 0.0056), (86, 85.9092602, 0.0986), (87, 86.9088771, 0.0700), (88, 87.9056121, 0.8258)),
+   39: ((89, 88.9058483, 1.0),),
+   40: ((90, 89.9047044, 0.5145), (91, 90.9056458, 0.1122), (92, 91.9050408, 0.1715), (94, 93.9063152, 0.1738), (96, 95.9082734, 0.0280)),
+   41: ((93, 92.9063781, 1.0),),
+   42: ((92, 91.906811, 0.1453), (94, 93.9050883, 0.0915), (95, 94.9058421, 0.1584), (96, 95.9046795, 0.1667), (97, 96.9060215, 0.0960), (98, 97.9054082, 0.2439), (100, 99.907477, 0.0982)),
+   44: ((96, 95.907598, 0.0554), (98, 97.905287, 0.0187), (99, 98.9059393, 0.1276), (100, 99.9042195, 0.1260), (101, 100.9055821, 0.1706), (102, 101.9043493, 0.3155), (104, 103.905433, 0.1862)),
+   45: ((103, 102.905504, 1.0),),
+   46: ((102, 101.905609, 0.0102), (104, 103.904036, 0.1114), (105, 104.905085, 0.2233), (106, 105.903486, 0.2733), (108, 107.903892, 0.2646), (110, 109.905153, 0.1172)),
+   47: ((107, 106.905097, 0.51839), (109, 108.904752, 0.48161)),
+   48: ((106, 105.906459, 0.0125), (108, 107.904184, 0.0089), (110, 109.9030021, 0.1249), (111, 110.9041781, 0.1280), (112, 111.9027578, 0.2413), (113, 112.9044017, 0.1222), (114, 113.9033585, 0.2873), (116, 115.904756, 0.0749)),
+   49: ((113, 112.904058, 0.0429), (115, 114.903878, 0.9571)),
+   50: ((112, 111.904818, 0.0097), (114, 113.902779, 0.0066), (115, 114.903342, 0.0034), (116, 115.901741, 0.1454), (117, 116.902952, 0.0768), (118, 117.901603, 0.2422), (119, 118.903308, 0.0859), (120, 119.9021947, 0.3258), (122, 121.9034390, 0.0463), (124, 123.9052739, 0.0579)),
+   51: ((121, 120.9038157, 0.5721), (123, 122.9042140, 0.4279)),
+   52: ((120, 119.904020, 0.0009), (122, 121.9030439, 0.0255), (123, 122.9042700, 0.0089), (124, 123.9028179, 0.0474), (125, 124.9044307, 0.0707), (126, 125.9033117, 0.1884), (128, 127.9044631, 0.3174), (130, 129.9062244, 0.3408)),
+   53: ((127, 126.904473, 1.0),),
+   54: ((124, 123.905893, 0.000952), (126, 125.904274, 0.000890), (128, 127.9035313, 0.019102), (129, 128.9047794, 0.264006), (130, 129.9035080, 0.040710), (131, 130.9050824, 0.212324), (132, 131.9041535, 0.269086), (134, 133.9053945, 0.104357), (136, 135.907219, 0.088573)),
+   55: ((133, 132.905451933, 1.0),),
+   56: ((130, 129.9063208, 0.00106), (132, 131.9050613, 0.00101), (134, 133.9045084, 0.02417), (135, 134.9056886, 0.06592), (136, 135.9045759, 0.07854), (137, 136.9058274, 0.11232), (138, 137.9052472, 0.71698)),
+   57: ((138, 137.907112, 0.00090), (139, 138.9063533, 0.99910)),
+   58: ((136, 135.907172, 0.00185), (138, 137.905991, 0.00251), (140, 139.9054387, 0.88450), (142, 141.909244, 0.11114)),
+   59: ((141, 140.9076528, 1.0),),
+   60: ((142, 141.9077233, 0.272), (143, 142.9098143, 0.122), (144, 143.9100873, 0.238), (145, 144.9125736, 0.083), (146, 145.9131169, 0.172), (148, 147.916893, 0.057), (150, 149.920891, 0.056)),
+   62: ((144, 143.911999, 0.0307), (147, 146.9148979, 0.1499), (148, 147.9148227, 0.1124), (149, 148.9171847, 0.1382), (150, 149.9172755, 0.0738), (152, 151.9197324, 0.2675), (154, 153.9222093, 0.2275)),
+   63: ((151, 150.9198502, 0.4781), (153, 152.9212303, 0.5219)),
+   64: ((152, 151.919791, 0.0020), (154, 153.9208656, 0.0218), (155, 154.922622, 0.1480), (156, 155.9221227, 0.2047), (157, 156.9239601, 0.1565), (158, 157.9241039, 0.2484), (160, 159.9270541, 0.2186)),
+   65: ((159, 158.9253468, 1.0),),
+   66: ((156, 155.924283, 0.00056), (158, 157.924409, 0.00095), (160, 159.9251975, 0.02329), (161, 160.9269334, 0.18889), (162, 161.9267984, 0.25475), (163, 162.9287312, 0.24896), (164, 163.9291748, 0.28260)),
+   67: ((165, 164.9303221, 1.0),),
+   68: ((162, 161.928778, 0.00139), (164, 163.929200, 0.01601), (166, 165.9302931, 0.33503), (167, 166.9320482, 0.22869), (168, 167.9323702, 0.26978), (170, 169.9354643, 0.14910)),
+   69: ((169, 168.9342133, 1.0),),
+   70: ((168, 167.933897, 0.0013), (170, 169.9347618, 0.0304), (171, 170.9363258, 0.1428), (172, 171.9363815, 0.2183), (173, 172.9382108, 0.1613), (174, 173.9388621, 0.3183), (176, 175.9425717, 0.1276)),
+   71: ((175, 174.9407718, 0.9741), (176, 175.9426863, 0.0259)),
+   72: ((174, 173.940046, 0.0016), (176, 175.9414086, 0.0526), (177, 176.9432207, 0.1860), (178, 177.9436988, 0.2728), (179, 178.9458161, 0.1362), (180, 179.9465500, 0.3508)),
+   73: ((180, 179.9474648, 0.00012), (181, 180.9479958, 0.99988)),
+   74: ((180, 179.946704, 0.0012), (182, 181.9482042, 0.2650), (183, 182.9502230, 0.1431), (184, 183.9509312, 0.3064), (186, 185.9543641, 0.2843)),
+   75: ((185, 184.9529550, 0.3740), (187, 186.9557531, 0.6260)),
+   76: ((184, 183.9524891, 0.0002), (186, 185.9538382, 0.0159), (187, 186.9557505, 0.0196), (188, 187.9558382, 0.1324), (189, 188.9581475, 0.1615), (190, 189.9584470, 0.2626), (192, 191.9614807, 0.4078)),
+   77: ((191, 190.9605940, 0.373), (193, 192.9629264, 0.627)),
+   78: ((190, 189.959932, 0.00014), (192, 191.9610380, 0.00782), (194, 193.9626803, 0.32967), (195, 194.9647911, 0.33832), (196, 195.9649515, 0.25242), (198, 197.967893, 0.07163)),
+   79: ((197, 196.9665687, 1.0),),
+   80: ((196, 195.965833, 0.0015), (198, 197.9667690, 0.0997), (199, 198.9682799, 0.1687), (200, 199.9683260, 0.2310), (201, 200.9703023, 0.1318), (202, 201.9706430, 0.2986), (204, 203.9734939, 0.0687)),
+   81: ((203, 202.9723442, 0.2952), (205, 204.9744275, 0.7048)),
+   82: ((204, 203.9730436, 0.014), (206, 205.9744653, 0.241), (207, 206.9758969, 0.221), (208, 207.9766521, 0.524)),
+   83: ((209, 208.9803987, 1.0),),
+   90: ((232, 232.0380553, 1.0),),
+   91: ((231, 231.0358840, 1.0),),
+   92: ((234, 234.0409521, 0.000054), (235, 235.0439299, 0.007204), (238, 238.0507882, 0.992742))
+}
+
+# The same table as contiguous arrays indexed by Z, so the per-atom lookups
+# in mass computations are a single index operation. Z = 0 is a placeholder.
+AtomicWeights = array("d", [0.0] + [PeriodicTable[z]["AtomicWeight"] for z in range(1, len(PeriodicTable) + 1)])
+Symbols = [None] + [PeriodicTable[z]["Symbol"] for z in range(1, len(PeriodicTable) + 1)]
+Groups = [None] + [PeriodicTable[z]["Group"] for z in range(1, len(PeriodicTable) + 1)]
+Periods = array("B", [0] + [PeriodicTable[z]["Period"] for z in range(1, len(PeriodicTable) + 1)])
+
+Elements = dict((Symbols[z], KnownElement(z)) for z in range(1, len(Symbols)))
+
+_atomic_weight_vector = None
+
+def atomic_weight_vector():
+   global _atomic_weight_vector
+
+   if _atomic_weight_vector is None:
+      import numpy
+
+      _atomic_weight_vector = numpy.array(AtomicWeights, dtype=numpy.float64)
+      _atomic_weight_vector.flags.writeable = False
+
+   return _atomic_weight_vector
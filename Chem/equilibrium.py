@@ -0,0 +1,141 @@
+from element import Molecule
+from unit import Product
+import numpy
+
+class EquilibriumResult:
+   def __init__(self, concentrations, extent, iterations, converged):
+      self.__concentrations = concentrations
+      self.__extent = extent
+      self.__iterations = iterations
+      self.__converged = converged
+
+   @property
+   def concentrations(self):
+      return self.__concentrations
+
+   @property
+   def extent(self):
+      return self.__extent
+
+   @property
+   def iterations(self):
+      return self.__iterations
+
+   @property
+   def converged(self):
+      return self.__converged
+
+   def __getitem__(self, molecule):
+      return self.__concentrations[Molecule(molecule)]
+
+   def __repr__(self):
+      return "EquilibriumResult({0} points, {1} converged)".format(self.converged.size, int(self.converged.sum()))
+
+class Equilibrium:
+   # The mass-action expression of a balanced equation: products over
+   # reagents, each raised to its coefficient. Species such as solids or the
+   # solvent, whose activity is one, are left out with 'exclude'.
+   def __init__(self, equation, exclude=()):
+      if not equation:
+         raise ValueError("Equation '{0}' is not valid".format(str(equation)))
+
+      exclude = set(Molecule(x) for x in exclude)
+      exponents = {}
+
+      for (k, v) in equation.units.items():
+         if k in exclude:
+            continue
+
+         exponents[k] = v.unit.ratio if isinstance(v, Product) else -v.unit.ratio
+
+      if not exponents:
+         raise ValueError("Equation '{0}' has no species left in its mass-action expression".format(str(equation)))
+
+      self.__exponents = exponents
+
+   @property
+   def exponents(self):
+      return dict(self.__exponents)
+
+   def quotient(self, concentrations):
+      result = 1.0
+
+      for (k, n) in self.__exponents.items():
+         result = result * numpy.asarray(concentrations[k], dtype=numpy.float64) ** n
+
+      return result
+
+   def solve(self, K, initial=None, tol=1e-12, maxiter=100):
+      # Solves Q(c0 + n * extent) = K for the extent of reaction at every
+      # condition at once. Newton's method runs on the logarithm of the
+      # quotient, which is monotonic in the extent. Steps that would leave the
+      # bracket of physical extents fall back to bisection.
+      initial = dict((Molecule(k), v) for (k, v) in (initial or {}).items())
+      species = list(self.__exponents.items())
+      logK = numpy.log(numpy.asarray(K, dtype=numpy.float64))
+      shape = numpy.broadcast(logK, *[numpy.asarray(initial.get(k, 0.0)) for (k, n) in species]).shape
+      c0 = [numpy.broadcast_to(numpy.asarray(initial.get(k, 0.0), dtype=numpy.float64), shape) for (k, n) in species]
+      logK = numpy.broadcast_to(logK, shape)
+
+      lo = numpy.full(shape, -numpy.inf)
+      hi = numpy.full(shape, numpy.inf)
+
+      for ((k, n), c) in zip(species, c0):
+         if n > 0:
+            lo = numpy.maximum(lo, -c / n)
+         else:
+            hi = numpy.minimum(hi, c / -n)
+
+      if numpy.any(lo >= hi):
+         raise ValueError("Initial concentrations leave no room for the reaction")
+
+      order = float(sum(n for (k, n) in species))
+      guess = numpy.exp(logK / order) if order > 0 else numpy.ones(shape)
+      extent = numpy.where(numpy.isfinite(lo) & numpy.isfinite(hi), (lo + hi) / 2, numpy.where(numpy.isfinite(lo), lo + guess, hi - guess))
+
+      eps = 4 * numpy.finfo(numpy.float64).eps
+      iterations = numpy.zeros(shape, dtype=numpy.int64)
+      converged = numpy.zeros(shape, dtype=bool)
+
+      for i in range(0, maxiter):
+         active = ~converged
+
+         if not active.any():
+            break
+
+         f = -logK
+         fp = numpy.zeros(shape)
+         spread = numpy.zeros(shape)
+         rounding = numpy.full(shape, numpy.inf)
+
+         for ((k, n), c) in zip(species, c0):
+            x = c + n * extent
+            f = f + n * numpy.log(x)
+            fp = fp + n * n / x
+            spread = numpy.maximum(spread, abs(n) / x)
+            rounding = numpy.minimum(rounding, eps * (numpy.abs(c) / abs(n) + numpy.abs(extent)))
+
+         lo = numpy.where(active & (f < 0), extent, lo)
+         hi = numpy.where(active & (f > 0), extent, hi)
+
+         step = -f / fp
+         proposal = extent + step
+         inside = (proposal > lo) & (proposal < hi)
+         proposal = numpy.where(inside, proposal, (lo + hi) / 2)
+
+         # A point is done on the residual at the current extent, which it
+         # keeps; the proposal may be a bisection midpoint far from the root.
+         # The step is measured against the smallest concentration, and a step
+         # lost in the rounding of every c0 + n * extent cannot improve it.
+         change = numpy.abs(proposal - extent)
+         done = active & ((numpy.abs(f) < tol) | (change * spread <= tol) | (change <= rounding))
+         extent = numpy.where(active & ~done, proposal, extent)
+         iterations = iterations + active
+         converged = converged | done
+
+      concentrations = dict((k, c + n * extent) for ((k, n), c) in zip(species, c0))
+
+      for (k, v) in initial.items():
+         concentrations.setdefault(k, numpy.broadcast_to(numpy.asarray(v, dtype=numpy.float64), shape))
+
+      return EquilibriumResult(concentrations, extent, iterations, converged)
@@ -13,15 +13,15 @@ HCl = Molecule(H, Cl) # titrant, a strong acid
 cHCl = Concentration(11.1 * 10**-3, Moles(HCl, 0.010 * 11.1 * 10**-3))
 
 # Chemical reaction in water
-eq = Reagent(MgOH2) == Product(Cation(Mg)) + Product(Anion(OH))
+eq = Reagent(MgOH2) == Product(Cation(Mg, charge=2)) + Product(Anion(OH))
 
 # HCl is a strong acid so it dissolves completely in water and removes all OH-.
 s = Sieve(eq.balance(), 5 * 10**-3, cHCl.content.to(Anion(OH)))
 
 # Get the concentrations of ions in solution.
-cMg = s[Cation(Mg)]
+cMg = s[Cation(Mg, charge=2)]
 cOH = s[Anion(OH)]
 
 print(cMg)
 print(cOH)
-print("Ks = [Mg+][OH-]^2 = {0}".format(cMg.value * cOH.value ** 2))
+print("Ks = [Mg2+][OH-]^2 = {0}".format(cMg.value * cOH.value ** 2))
@@ -0,0 +1,144 @@
+from element import Isotopes, KnownElement, parse_formula
+from math import ceil, sqrt
+import numpy
+
+class IsotopePattern:
+   def __init__(self, masses, abundances):
+      self.__masses = masses
+      self.__abundances = abundances
+
+   @property
+   def masses(self):
+      return self.__masses
+
+   @property
+   def abundances(self):
+      return self.__abundances
+
+   def __len__(self):
+      return len(self.__masses)
+
+   def __iter__(self):
+      return iter(zip(self.__masses, self.__abundances))
+
+   def __repr__(self):
+      return "IsotopePattern({0} peaks, {1})".format(len(self), ", ".join("{0:.4f}: {1:.3e}".format(m, a) for (m, a) in list(self)[:3]))
+
+class _Distribution:
+   # The isotopes of one element binned on the mass grid: the probability of
+   # every bin offset from the lightest isotope, and how far each isotope
+   # sits from its bin, for the centroid masses.
+   def __init__(self, z, resolution):
+      isotopes = Isotopes.get(z)
+
+      if not isotopes:
+         raise ValueError("No isotope data for element '{0}'".format(str(KnownElement(z))))
+
+      total = float(sum(x[2] for x in isotopes))
+      lightest = min(x[1] for x in isotopes)
+      self.lightest = lightest
+      self.bins = []
+
+      for (number, mass, abundance) in isotopes:
+         k = int(round((mass - lightest) / resolution))
+         self.bins.append((k, abundance / total, mass - lightest - k * resolution))
+
+      self.mean = sum(k * p for (k, p, d) in self.bins)
+      self.variance = sum(k * k * p for (k, p, d) in self.bins) - self.mean ** 2
+      self.width = max(k for (k, p, d) in self.bins)
+
+   def transform(self, size):
+      p = numpy.zeros(size)
+      m = numpy.zeros(size)
+
+      for (k, probability, deviation) in self.bins:
+         p[k % size] += probability
+         m[k % size] += probability * deviation
+
+      return (numpy.fft.rfft(p), numpy.fft.rfft(m))
+
+def _power(a, b, exponents):
+   # (a + b e)^n with e^2 = 0 by repeated squaring, for every exponent at
+   # once. The a part is the power of the distribution, the b part carries
+   # the mass deviations along, n a^(n - 1) b.
+   (x, y) = (numpy.ones((len(exponents), len(a)), dtype=complex), numpy.zeros((len(exponents), len(a)), dtype=complex))
+   (a, b) = (numpy.broadcast_to(a, x.shape), numpy.broadcast_to(b, x.shape))
+   exponents = numpy.asarray(exponents)
+
+   while exponents.any():
+      odd = (exponents & 1).astype(bool)[:, None]
+      (x, y) = (numpy.where(odd, x * a, x), numpy.where(odd, x * b + y * a, y))
+      (a, b) = (a * a, 2 * a * b)
+      exponents = exponents >> 1
+
+   return (x, y)
+
+def _window(counts, distributions):
+   # The number of bins to transform over. Small molecules get their whole
+   # pattern, large ones a window many standard deviations wide around the
+   # mean, the tails beyond it are far below any useful threshold.
+   width = sum(n * distributions[z].width for (z, n) in counts) + 1
+   mean = sum(n * distributions[z].mean for (z, n) in counts)
+   deviation = sqrt(sum(n * distributions[z].variance for (z, n) in counts))
+   size = min(width, int(ceil(24 * deviation)) + 16)
+   size = 1 << (size - 1).bit_length()
+
+   if size >= width:
+      return (size, 0)
+
+   return (size, max(0, int(mean) - size // 2))
+
+def isotope_patterns(molecules, resolution=1.0, threshold=1e-6, chunksize=1024):
+   # Isotope patterns of many molecules or formulas, peaks merged on a grid
+   # of 'resolution' daltons. Every element distribution is transformed
+   # once, raised to its count in frequency space and multiplied in, so the
+   # cost grows with the pattern width and not with the number of atoms.
+   # Molecules sharing a window size are worked out together, 'chunksize'
+   # at a time. Peaks below 'threshold' of the largest one are left out.
+   if resolution <= 0:
+      raise ValueError("'resolution' cannot be negative or zero")
+
+   if chunksize <= 0:
+      raise ValueError("'chunksize' cannot be negative or zero")
+
+   compositions = [parse_formula(x).composition if isinstance(x, basestring) else x.composition for x in molecules]
+   distributions = {}
+
+   for z in set(z for x in compositions for (z, n) in x):
+      distributions[z] = _Distribution(z, resolution)
+
+   groups = {}
+
+   for (i, counts) in enumerate(compositions):
+      (size, start) = _window(counts, distributions)
+      groups.setdefault(size, []).append((i, start))
+
+   result = [None] * len(compositions)
+
+   for (size, members) in groups.items():
+      transforms = dict((z, d.transform(size)) for (z, d) in distributions.items())
+
+      for offset in range(0, len(members), chunksize):
+         chunk = members[offset:offset + chunksize]
+         present = sorted(set(z for (i, start) in chunk for (z, n) in compositions[i]))
+         (p, q) = (numpy.ones((len(chunk), size // 2 + 1), dtype=complex), numpy.zeros((len(chunk), size // 2 + 1), dtype=complex))
+
+         for z in present:
+            exponents = [dict(compositions[i]).get(z, 0) for (i, start) in chunk]
+            (x, y) = _power(transforms[z][0], transforms[z][1], exponents)
+            (p, q) = (p * x, p * y + q * x)
+
+         (p, q) = (numpy.fft.irfft(p, size), numpy.fft.irfft(q, size))
+
+         for (row, (i, start)) in enumerate(chunk):
+            abundances = numpy.roll(p[row], -start)
+            deviations = numpy.roll(q[row], -start)
+            keep = abundances > threshold * abundances.max()
+            k = numpy.arange(start, start + size)[keep]
+            base = sum(n * distributions[z].lightest for (z, n) in compositions[i])
+            result[i] = IsotopePattern(base + k * resolution + deviations[keep] / abundances[keep], abundances[keep])
+
+   return result
+
+def isotope_pattern(molecule, resolution=1.0, threshold=1e-6):
+   return isotope_patterns([molecule], resolution, threshold)[0]
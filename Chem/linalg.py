@@ -0,0 +1,380 @@
+from fractions import Fraction
+
+def gcd(a, b):
+   while b:
+      (a, b) = (b, a % b)
+
+   return abs(a)
+
+def lcm(a, b):
+   return a * b // gcd(a, b) if a and b else 0
+
+def rref(matrix):
+   # Reduced row echelon form over the rationals, so no precision is lost
+   # no matter how large the coefficients grow.
+   rows = [[Fraction(x) for x in row] for row in matrix]
+   pivots = []
+   r = 0
+
+   for c in range(0, len(rows[0]) if rows else 0):
+      if r == len(rows):
+         break
+
+      pivot = None
+
+      for i in range(r, len(rows)):
+         if rows[i][c] != 0:
+            pivot = i
+            break
+
+      if pivot is None:
+         continue
+
+      (rows[r], rows[pivot]) = (rows[pivot], rows[r])
+      p = rows[r][c]
+      rows[r] = [x / p for x in rows[r]]
+
+      for i in range(0, len(rows)):
+         f = rows[i][c]
+
+         if i != r and f != 0:
+            rows[i] = [x - f * y for (x, y) in zip(rows[i], rows[r])]
+
+      pivots.append(c)
+      r += 1
+
+   return (rows[:r], pivots)
+
+def nullspace(matrix, columns):
+   (rows, pivots) = rref(matrix)
+   basis = []
+
+   for free in range(0, columns):
+      if free in pivots:
+         continue
+
+      vector = [Fraction(0)] * columns
+      vector[free] = Fraction(1)
+
+      for (row, p) in zip(rows, pivots):
+         vector[p] = -row[free]
+
+      basis.append(vector)
+
+   return basis
+
+def integer_vector(vector):
+   denominator = 1
+
+   for x in vector:
+      denominator = lcm(denominator, Fraction(x).denominator)
+
+   values = [int(Fraction(x) * denominator) for x in vector]
+   divisor = 0
+
+   for x in values:
+      divisor = gcd(divisor, x)
+
+   if not divisor:
+      return values
+
+   return [x // divisor for x in values]
+
+def sparse_rref(rows):
+   # Reduced row echelon form of a sparse matrix given as dictionaries from
+   # column to value. Rows are reduced one at a time against the pivots found
+   # so far, and every new pivot is eliminated from the earlier rows, so the
+   # result stays fully reduced without ever touching a zero. Returns the
+   # rows keyed by their pivot column.
+   (pivots, occurs) = ({}, {})
+
+   for row in rows:
+      _eliminate(row, pivots, occurs)
+
+   return pivots
+
+def independent_rows(rows):
+   # Indices of the rows independent of all the rows before them.
+   (pivots, occurs) = ({}, {})
+   return [i for (i, row) in enumerate(rows) if _eliminate(row, pivots, occurs)]
+
+def _eliminate(row, pivots, occurs):
+   row = dict((c, Fraction(x)) for (c, x) in row.items() if x)
+
+   # Pivot rows hold no other pivot column, so one pass clears them all.
+   for c in [c for c in row if c in pivots]:
+      f = row.pop(c)
+
+      for (k, x) in pivots[c].items():
+         if k != c:
+            y = row.get(k, 0) - f * x
+
+            if y:
+               row[k] = y
+            else:
+               row.pop(k, None)
+
+   if not row:
+      return False
+
+   # The column in the fewest pivot rows keeps the fill-in small.
+   c = min(row, key=lambda k: (len(occurs.get(k, ())), k))
+   p = row[c]
+   row = dict((k, x / p) for (k, x) in row.items())
+
+   for q in occurs.pop(c, ()):
+      other = pivots[q]
+      f = other.pop(c, 0)
+
+      if not f:
+         continue
+
+      for (k, x) in row.items():
+         if k != c:
+            y = other.get(k, 0) - f * x
+
+            if y:
+               other[k] = y
+               occurs.setdefault(k, set()).add(q)
+            else:
+               other.pop(k, None)
+
+   pivots[c] = row
+
+   for k in row:
+      if k != c:
+         occurs.setdefault(k, set()).add(c)
+
+   return True
+
+def sparse_nullspace(rows, columns):
+   pivots = sparse_rref(rows)
+   occurs = {}
+
+   for (p, row) in pivots.items():
+      for k in row:
+         if k != p:
+            occurs.setdefault(k, []).append(p)
+
+   basis = []
+
+   for free in range(0, columns):
+      if free in pivots:
+         continue
+
+      vector = {free: Fraction(1)}
+
+      for p in occurs.get(free, ()):
+         vector[p] = -pivots[p][free]
+
+      basis.append(vector)
+
+   return basis
+
+def simplex(rows, rhs, costs):
+   # Minimises costs . z subject to rows z = rhs and z >= 0, in exact
+   # rational arithmetic, or gives None when no such z exists. The two
+   # phase tableau method with Bland's rule, which cannot cycle. The last
+   # row of the tableau holds the reduced costs and is pivoted like the
+   # others.
+   m = len(rows)
+   n = len(costs)
+   tableau = []
+
+   for (i, (row, b)) in enumerate(zip(rows, rhs)):
+      sign = -1 if b < 0 else 1
+      tableau.append([Fraction(sign * x) for x in row] + [Fraction(int(i == k)) for k in range(0, m)] + [Fraction(sign * b)])
+
+   basis = list(range(n, n + m))
+
+   def pivot(r, c):
+      p = tableau[r][c]
+      tableau[r] = [x / p for x in tableau[r]]
+
+      for i in range(0, len(tableau)):
+         f = tableau[i][c]
+
+         if i != r and f:
+            tableau[i] = [x - f * y for (x, y) in zip(tableau[i], tableau[r])]
+
+      basis[r] = c
+
+   def optimise(objective, allowed):
+      # Reduced costs of the objective against the current basis.
+      reduced = [Fraction(x) for x in objective] + [Fraction(0)]
+
+      for (i, c) in enumerate(basis):
+         f = reduced[c]
+
+         if f:
+            reduced = [x - f * y for (x, y) in zip(reduced, tableau[i])]
+
+      tableau.append(reduced)
+
+      while True:
+         entering = next((c for c in range(0, allowed) if reduced[c] < 0), None)
+
+         if entering is None:
+            break
+
+         leaving = None
+
+         for i in range(0, len(basis)):
+            if tableau[i][entering] > 0:
+               ratio = tableau[i][-1] / tableau[i][entering]
+
+               if leaving is None or (ratio, basis[i]) < best:
+                  (leaving, best) = (i, (ratio, basis[i]))
+
+         if leaving is None:
+            raise ValueError("Linear program is unbounded")
+
+         pivot(leaving, entering)
+         reduced = tableau[-1]
+
+      tableau.pop()
+
+   optimise([0] * n + [1] * m, n + m)
+
+   if any(tableau[i][-1] for i in range(0, m) if basis[i] >= n):
+      return None
+
+   # Artificial variables left in the basis are zero; they are swapped for
+   # real ones, or their row is redundant and goes.
+   for i in reversed(range(0, m)):
+      if basis[i] >= n:
+         c = next((c for c in range(0, n) if tableau[i][c]), None)
+
+         if c is None:
+            del tableau[i]
+            del basis[i]
+         else:
+            pivot(i, c)
+
+   optimise(list(costs) + [0] * m, n)
+   z = [Fraction(0)] * n
+
+   for (i, c) in enumerate(basis):
+      z[c] = tableau[i][-1]
+
+   return z
+
+def positive_combination(basis, positive=None):
+   # The weights w of the combination x = sum(w[j] * basis[j]) with every
+   # x[i] >= 0, x[i] >= 1 on the columns in 'positive' (all of them by
+   # default) and the smallest total, or None when there is no such
+   # combination. The free columns of a canonical basis make every such
+   # weight non-negative, so w >= 0 costs nothing.
+   (d, n) = (len(basis), len(basis[0]))
+   positive = set(range(0, n)) if positive is None else set(positive)
+   columns = [i for i in range(0, n) if i in positive or any(x[i] for x in basis)]
+   rows = [[x[i] for x in basis] + [-int(i == k) for k in columns] for i in columns]
+   z = simplex(rows, [int(i in positive) for i in columns], [sum(x) for x in basis] + [0] * len(columns))
+   return z[:d] if z is not None else None
+
+class IncrementalNullspace:
+   # Null space of a sparse matrix whose columns come and go one at a time.
+   # Columns are eliminated as rows, each carrying the combination of
+   # original columns it stands for. A column that reduces to nothing gives
+   # a null vector; removing a column cancels it out of one combination,
+   # a rank one change, instead of starting over.
+   def __init__(self):
+      self.__pivots = {}
+      self.__null = []
+      self.__next = 0
+
+   def copy(self):
+      result = IncrementalNullspace()
+      result.__pivots = dict((c, (dict(row), dict(combination))) for (c, (row, combination)) in self.__pivots.items())
+      result.__null = [dict(x) for x in self.__null]
+      result.__next = self.__next
+      return result
+
+   def add(self, column):
+      key = self.__next
+      self.__next += 1
+      row = dict((k, Fraction(x)) for (k, x) in column.items() if x)
+      combination = {key: Fraction(1)}
+
+      for c in [c for c in row if c in self.__pivots]:
+         f = row.pop(c)
+         (pivot, source) = self.__pivots[c]
+         _subtract(row, pivot, f, c)
+         _subtract(combination, source, f)
+
+      if not row:
+         self.__null.append(combination)
+         return key
+
+      c = min(row)
+      p = row[c]
+      row = dict((k, x / p) for (k, x) in row.items())
+      combination = dict((k, x / p) for (k, x) in combination.items())
+
+      for (other, source) in self.__pivots.values():
+         f = other.pop(c, 0)
+
+         if f:
+            _subtract(other, row, f, c)
+            _subtract(source, combination, f)
+
+      self.__pivots[c] = (row, combination)
+      return key
+
+   def remove(self, key):
+      for (i, vector) in enumerate(self.__null):
+         if key in vector:
+            # A null vector holding the column cancels it everywhere else,
+            # the pivot rows themselves stay the same.
+            del self.__null[i]
+            f = vector[key]
+
+            for x in self.__null + [source for (row, source) in self.__pivots.values()]:
+               if key in x:
+                  _subtract(x, vector, x[key] / f)
+
+            return
+
+      for (c, (row, source)) in self.__pivots.items():
+         if key in source:
+            # The column was independent of the others, its pivot row goes
+            # and the remaining rows lose their share of it.
+            del self.__pivots[c]
+            f = source[key]
+
+            for (other, x) in self.__pivots.values():
+               if key in x:
+                  g = x[key] / f
+                  _subtract(other, row, g)
+                  _subtract(x, source, g)
+
+            return
+
+      raise KeyError(key)
+
+   def basis(self):
+      return [dict(x) for x in self.__null]
+
+def _subtract(target, row, f, skip=None):
+   for (k, x) in row.items():
+      if k != skip:
+         y = target.get(k, 0) - f * x
+
+         if y:
+            target[k] = y
+         else:
+            target.pop(k, None)
+
+def canonical_nullspace(basis, columns):
+   # Turns any basis of a null space into the one nullspace() gives: the
+   # free columns are the last independent ones of the basis, and each
+   # vector is one on its own free column and zero on the others.
+   if not basis:
+      return []
+
+   if len(basis) == 1:
+      f = basis[0][max(basis[0])]
+      return [[Fraction(basis[0].get(i, 0)) / f for i in range(0, columns)]]
+
+   (rows, pivots) = rref([[x.get(i, 0) for i in reversed(range(0, columns))] for x in basis])
+   return [row[::-1] for row in reversed(rows)]
@@ -0,0 +1,251 @@
+from element import KnownElement
+from unit import Reagent, Product, CompoundReagent, CompoundProduct, Equation, Charge, make_side, integer_ratios
+from linalg import sparse_nullspace, independent_rows, canonical_nullspace, positive_combination, integer_vector
+from fractions import Fraction
+
+class ReactionNetwork:
+   # A whole mechanism as one sparse stoichiometric matrix: a column per
+   # reaction holding the coefficient of every species taking part in it,
+   # negative for reagents and positive for products. Species shared between
+   # reactions are stored once.
+   def __init__(self, equations):
+      self.__equations = tuple(equations)
+      self.__species = []
+      self.__index = {}
+      self.__columns = []
+
+      for eq in self.__equations:
+         column = {}
+
+         for (sign, units) in ((-1, eq.reagents), (1, eq.products)):
+            for x in units:
+               i = self.__add_species(x.unit.molecule)
+               column[i] = column.get(i, 0) + sign * x.unit.ratio
+
+         self.__columns.append(dict((i, n) for (i, n) in column.items() if n))
+
+   def __add_species(self, molecule):
+      i = self.__index.get(molecule)
+
+      if i is None:
+         i = self.__index[molecule] = len(self.__species)
+         self.__species.append(molecule)
+
+      return i
+
+   @property
+   def equations(self):
+      return self.__equations
+
+   @property
+   def species(self):
+      return tuple(self.__species)
+
+   def index(self, molecule):
+      return self.__index[molecule]
+
+   def stoichiometric_matrix(self):
+      # Coordinate form, entry i is the coefficient values[i] of species
+      # rows[i] in reaction columns[i].
+      (rows, columns, values) = ([], [], [])
+
+      for (j, column) in enumerate(self.__columns):
+         for (i, n) in sorted(column.items()):
+            rows.append(i)
+            columns.append(j)
+            values.append(n)
+
+      return (rows, columns, values)
+
+   def residuals(self):
+      # The element and charge imbalance of every reaction, reagent minus
+      # product like Equation.residual(), from one sweep over the matrix. Each
+      # species composition is looked up only once for the whole network.
+      compositions = [x.composition for x in self.__species]
+      charges = [x.charge for x in self.__species]
+      result = []
+
+      for column in self.__columns:
+         counts = {}
+         charge = 0
+
+         for (i, n) in column.items():
+            for (z, m) in compositions[i]:
+               counts[z] = counts.get(z, 0) - n * m
+
+            charge -= n * charges[i]
+
+         residual = dict((KnownElement(z), n) for (z, n) in counts.items() if n)
+
+         if charge:
+            residual[Charge] = charge
+
+         result.append(residual)
+
+      return result
+
+   def inconsistent(self):
+      return [(j, self.__equations[j], residual) for (j, residual) in enumerate(self.residuals()) if residual]
+
+   def balance(self):
+      # Gives a network with every inconsistent reaction balanced, all of them
+      # from one sparse solve. Each reaction owns a block of columns, one per
+      # species it lists, and a block of rows, one per element and one for
+      # the charge of ions. The null space of the block diagonal matrix falls
+      # apart into the null space of every reaction, which gives the same
+      # coefficients as Equation.balance(). Reactions that cannot be balanced
+      # are kept as they are and still show up in inconsistent().
+      pending = [j for (j, eq, residual) in self.inconsistent()]
+      (rows, blocks, owner) = ([], [], [])
+
+      for j in pending:
+         eq = self.__equations[j]
+         units = list(eq.reagents) + list(eq.products)
+         signs = [1] * len(eq.reagents) + [-1] * len(eq.products)
+         offset = len(owner)
+         counts = {}
+         charges = {}
+
+         for (i, (x, sign)) in enumerate(zip(units, signs)):
+            molecule = x.unit.molecule
+
+            for (z, n) in molecule.composition:
+               counts.setdefault(z, {})[offset + i] = sign * n
+
+            if molecule.charge:
+               charges[offset + i] = sign * molecule.charge
+
+         rows.extend(counts[z] for z in sorted(counts))
+
+         if charges:
+            rows.append(charges)
+
+         owner.extend([len(blocks)] * len(units))
+         blocks.append((j, units, offset, []))
+
+      for vector in sparse_nullspace(rows, len(owner)):
+         (j, units, offset, basis) = blocks[owner[next(iter(vector))]]
+         basis.append(dict((c - offset, x) for (c, x) in vector.items()))
+
+      equations = list(self.__equations)
+
+      for (j, units, offset, basis) in blocks:
+         ratios = integer_ratios(canonical_nullspace(basis, len(units)))
+
+         if ratios:
+            reagents = [x.copy(ratio) for (x, ratio) in zip(units, ratios) if isinstance(x, Reagent)]
+            products = [x.copy(ratio) for (x, ratio) in zip(units, ratios) if isinstance(x, Product)]
+            equations[j] = Equation(make_side(CompoundReagent, reagents), make_side(CompoundProduct, products))
+
+      return ReactionNetwork(equations)
+
+   def conserved_moieties(self):
+      # A basis of the conservation laws with no negative entries, as integer
+      # combinations of species whose total amount no reaction changes. Such
+      # laws span the left null space of the stoichiometric matrix restricted
+      # to the species some non-negative law holds. The basis prefers the
+      # atoms of an element or the charge where those are conserved; any
+      # species not covered by them gets a law from a linear program, and
+      # the rest of the span is filled by null vectors made non-negative
+      # with enough of the covering laws added. Each step is a sparse
+      # elimination or a small exact linear program, so the cost stays
+      # polynomial in the size of the network.
+      n = len(self.__species)
+      null = sparse_nullspace(self.__columns, n)
+
+      if not null:
+         return []
+
+      # Element and charge totals of every species, kept where every reaction
+      # conserves them and nothing is negative.
+      candidates = {}
+
+      for (i, x) in enumerate(self.__species):
+         for (z, m) in x.composition:
+            candidates.setdefault(z, {})[i] = m
+
+      charges = dict((i, x.charge) for (i, x) in enumerate(self.__species) if x.charge)
+      candidates = [candidates[z] for z in sorted(candidates)]
+
+      if charges and (all(x > 0 for x in charges.values()) or all(x < 0 for x in charges.values())):
+         candidates.append(dict((i, abs(x)) for (i, x) in charges.items()))
+
+      candidates = [x for x in candidates if all(not sum(x.get(i, 0) * m for (i, m) in column.items()) for column in self.__columns)]
+
+      # Null vectors that already have one sign are laws as they are.
+      candidates.extend(dict((i, abs(x)) for (i, x) in v.items()) for v in null if all(x > 0 for x in v.values()) or all(x < 0 for x in v.values()))
+
+      laws = list(candidates)
+      covered = set(i for x in laws for i in x)
+
+      # Reactions only link the species of one connected part of the
+      # network, and every null vector lies in one part, so each linear
+      # program only sees the part of the species it is about.
+      part = list(range(0, n))
+
+      def find(i):
+         while part[i] != i:
+            part[i] = part[part[i]]
+            i = part[i]
+
+         return i
+
+      for column in self.__columns:
+         keys = list(column)
+
+         for k in keys[1:]:
+            part[find(k)] = find(keys[0])
+
+      for i in sorted(set(i for v in null for i in v) - covered):
+         if i not in covered:
+            members = [k for k in range(0, n) if find(k) == find(i)]
+            dense = [[v.get(k, 0) for k in members] for v in null if find(next(iter(v))) == find(i)]
+            weights = positive_combination(dense, [members.index(i)])
+
+            if weights is not None:
+               vector = dict((k, x) for (k, x) in ((k, sum(w * v[j] for (w, v) in zip(weights, dense))) for (j, k) in enumerate(members)) if x)
+               laws.append(vector)
+               covered.update(vector)
+
+      result = [laws[i] for i in independent_rows(laws)]
+      span = sparse_nullspace([dict((i, m) for (i, m) in column.items() if i in covered) for column in self.__columns] + [{i: 1} for i in range(0, n) if i not in covered], n)
+
+      if len(result) < len(span):
+         # The rest of the span comes from null vectors on the covered species,
+         # made non-negative with a multiple of the sum of every law, which is
+         # positive on all of them.
+         interior = {}
+
+         for x in laws:
+            for (i, m) in x.items():
+               interior[i] = interior.get(i, 0) + m
+
+         for v in span:
+            t = max([Fraction(-x, interior[i]) for (i, x) in v.items()] + [0])
+
+            if t:
+               v = dict((i, x) for (i, x) in ((i, v.get(i, 0) + t * interior[i]) for i in covered) if x)
+
+            result.append(v)
+
+         result = [result[i] for i in independent_rows(result)]
+
+      return [dict((self.__species[i], m) for (i, m) in zip(sorted(x), integer_vector([x[i] for i in sorted(x)]))) for x in result]
+
+   def __len__(self):
+      return len(self.__equations)
+
+   def __iter__(self):
+      return iter(self.__equations)
+
+   def __getitem__(self, index):
+      return self.__equations[index]
+
+   def __bool__(self):
+      return not self.inconsistent()
+
+   def __nonzero__(self):
+      return self.__bool__()
+
+   def __repr__(self):
+      return "ReactionNetwork({0} reactions, {1} species)".format(len(self.__equations), len(self.__species))
@@ -1,45 +1,226 @@
 from element import Molecule
-from itertools import chain
+from stats import instrumentation
 
-class Sieve:
+class Sieve(object):
+   # Contents are kept as plain amounts in moles per species. A sieve never
+   # changes them, so snapshots and builders made from it share the same
+   # dictionary until one of them is modified.
    def __init__(self, equation, size, *args):
       if not equation:
          raise ValueError("Equation '{0}' is not valid".format(str(equation)))
 
-      self.__eq = equation
-      self.__size = size
-      self.__contents = {}
+      amounts = {}
+      reference = None
       
       for x in args:
-         if x.molecule in self.__contents:
-            self.__contents[x.molecule] += x.moles
+         moles = x.moles
+
+         if x.molecule in amounts:
+            amounts[x.molecule] = amounts[x.molecule] + moles.value
          else:
-            self.__contents[x.molecule] = x.moles
+            amounts[x.molecule] = moles.value
+
+            if reference is None and equation[x.molecule]:
+               reference = x.molecule
+
+      self.__assign(equation, size, amounts, reference)
+
+   @classmethod
+   def _from_amounts(cls, equation, size, amounts, reference, ratios=None):
+      # Builds a sieve around amounts that are already summed up, without
+      # checking the equation again. The dictionary is taken over as is.
+      sieve = cls.__new__(cls)
+      sieve.__assign(equation, size, amounts, reference, ratios)
+      return sieve
+
+   def __assign(self, equation, size, amounts, reference, ratios=None):
+      self.__eq = equation
+      self.__size = size
+      self.__amounts = amounts
+
+      # The first content that takes part in the reaction determines the
+      # amounts of every species in the equation, so the ratio from it to
+      # each of them is computed once here.
+      self.__reference = reference
+      self.__ratios = ratios if ratios is not None else reference_ratios(equation, reference)
+
+   @property
+   def equation(self):
+      return self.__eq
+
+   @property
+   def size(self):
+      return self.__size
+
+   @property
+   def reference(self):
+      return self.__reference
+
+   def amounts(self):
+      return dict(self.__amounts)
+
+   def builder(self):
+      return SieveBuilder._from_amounts(self.__eq, self.__size, self.__amounts, self.__reference, self.__ratios)
 
    def __add__(self, x):
-      if not isinstance(x, self.__class__):
-         x = [x]
+      builder = self.builder()
+
+      for y in (x if isinstance(x, self.__class__) else [x]):
+         builder.add(y)
 
-      return Sieve(self.__eq, self.__size, *chain(self, x))
+      return builder.freeze()
 
    def __getitem__(self, molecule):
+      if instrumentation.enabled:
+         instrumentation.count("sieve.lookups")
+
       molecule = Molecule(molecule)
-      unit = self.__eq[molecule]
+      ratio = self.__ratios.get(molecule)
       
-      if unit:
-         for (k, v) in self.__contents.items():
-            reference = self.__eq[k]
-            
-            if reference:
-               return Concentration(self.__size, (v.moles * (unit.unit.ratio / float(reference.unit.ratio))).to(molecule))
+      if ratio is not None:
+         return Concentration(self.__size, Moles(molecule, self.__amounts[self.__reference] * ratio))
+
+      return Concentration(self.__size, Moles(molecule, self.__amounts[molecule]))
+
+   def concentrations(self):
+      if instrumentation.enabled:
+         instrumentation.count("sieve.bulk_lookups")
+
+      result = dict((k, Concentration(self.__size, Moles(k, v))) for (k, v) in self.__amounts.items())
+
+      if self.__reference is not None:
+         amount = self.__amounts[self.__reference]
+
+         for (k, ratio) in self.__ratios.items():
+            result[k] = Concentration(self.__size, Moles(k, amount * ratio))
+
+      return result
 
-      return Concentration(self.__size, self.__contents[molecule])
+   def __len__(self):
+      return len(self.__amounts)
 
    def __iter__(self):
-      return iter(self.__contents.values())
+      return (Moles(k, v) for (k, v) in self.__amounts.items())
       
    def __repr__(self):
-      return "Sieve[{0}]({1}, {2})".format(str(self.__eq), self.__size, repr(dict(self.__contents)))
+      return "Sieve[{0}]({1}, {2})".format(str(self.__eq), self.__size, repr(dict((k, Moles(k, v)) for (k, v) in self.__amounts.items())))
+
+def reference_ratios(equation, reference):
+   ratios = {}
+
+   if reference is not None:
+      units = equation.units
+      base = float(units[reference].unit.ratio)
+
+      for (k, v) in units.items():
+         ratios[k] = v.unit.ratio / base
+
+   return ratios
+
+class SieveBuilder(object):
+   # Mutable counterpart of Sieve for adding many contributions to the same
+   # vessel. Amounts are summed in place as plain moles, floats or arrays,
+   # so no unit objects are created per addition. freeze() gives an
+   # immutable Sieve of the current contents and the builder stays usable.
+   # Frozen sieves and copies share the amounts with the builder, which only
+   # copies them on its next modification.
+   def __init__(self, equation, size, *args):
+      if not equation:
+         raise ValueError("Equation '{0}' is not valid".format(str(equation)))
+
+      self.__assign(equation, size, {}, None, {})
+
+      for x in args:
+         self.add(x)
+
+   @classmethod
+   def _from_amounts(cls, equation, size, amounts, reference, ratios):
+      builder = cls.__new__(cls)
+      builder.__assign(equation, size, amounts, reference, ratios, True)
+      return builder
+
+   def __assign(self, equation, size, amounts, reference, ratios, shared=False):
+      self.__eq = equation
+      self.__size = size
+      self.__amounts = amounts
+      self.__reference = reference
+      self.__ratios = ratios
+      self.__shared = shared
+
+   @property
+   def equation(self):
+      return self.__eq
+
+   @property
+   def size(self):
+      return self.__size
+
+   def add(self, x):
+      moles = x.moles
+      return self.add_moles(moles.molecule, moles.value)
+
+   def add_moles(self, molecule, value):
+      molecule = Molecule(molecule)
+
+      if self.__shared:
+         self.__amounts = dict(self.__amounts)
+         self.__shared = False
+
+      amount = self.__amounts.get(molecule)
+
+      if amount is None:
+         self.__amounts[molecule] = value
+
+         if self.__reference is None and self.__eq[molecule]:
+            self.__reference = molecule
+            self.__ratios = reference_ratios(self.__eq, molecule)
+      else:
+         # Not '+=', an array handed in by the caller must not change.
+         self.__amounts[molecule] = amount + value
+
+      return self
+
+   def extend(self, units):
+      for x in units:
+         self.add(x)
+
+      return self
+
+   def __iadd__(self, x):
+      if isinstance(x, (Sieve, SieveBuilder)):
+         return self.extend(x)
+
+      return self.add(x)
+
+   def __getitem__(self, molecule):
+      return self.__amounts[Molecule(molecule)]
+
+   def __contains__(self, molecule):
+      return Molecule(molecule) in self.__amounts
+
+   def __len__(self):
+      return len(self.__amounts)
+
+   def __iter__(self):
+      return (Moles(k, v) for (k, v) in self.__amounts.items())
+
+   def copy(self):
+      self.__shared = True
+      return SieveBuilder._from_amounts(self.__eq, self.__size, self.__amounts, self.__reference, self.__ratios)
+
+   def freeze(self):
+      self.__shared = True
+      return Sieve._from_amounts(self.__eq, self.__size, self.__amounts, self.__reference, self.__ratios)
+
+   def __repr__(self):
+      return "SieveBuilder[{0}]({1}, {2} species)".format(str(self.__eq), self.__size, len(self.__amounts))
+
+def format_amount(value):
+   try:
+      return "{0:.3e}".format(value)
+   except (TypeError, ValueError):
+      # Arrays of amounts have no scalar format, they print themselves.
+      return str(value)
 
 class MoleculeUnit:
    def __init__(self, molecule, amount):
@@ -90,10 +271,10 @@ class MoleculeUnit:
 
    def __str__(self):
       symbol = self._symbol
-      return "{0} ({1:.3e}{2}{3})".format(str(self.molecule), self.value, " " if symbol else None, symbol)
+      return "{0} ({1}{2}{3})".format(str(self.molecule), format_amount(self.value), " " if symbol else None, symbol)
       
    def __repr__(self):
-      return "{0}[{1}]({2:.3e})".format(self.__class__.__name__, str(self.molecule), self.value)
+      return "{0}[{1}]({2})".format(self.__class__.__name__, str(self.molecule), format_amount(self.value))
       
 class Moles(MoleculeUnit):
    def __init__(self, *args, **kwargs):
@@ -141,7 +322,8 @@ class Grams(MoleculeUnit):
 
 class Concentration:
    def __init__(self, size, content):
-      if size <= 0:
+      # Size may also be an array of sizes, one per sample.
+      if (size.min() if hasattr(size, "min") else size) <= 0:
          raise ValueError("'size' cannot be negative or zero")
 
       self.__size = size
@@ -160,7 +342,7 @@ class Concentration:
       return (self.content.moles / self.size).value
 
    def __str__(self):
-      return "[{0:.3e} M of {1}]".format(self.value, str(self.content))
+      return "[{0} M of {1}]".format(format_amount(self.value), str(self.content))
       
    def __repr__(self):
-      return "Concentration({0:.3e} M, {1})".format(self.value, repr(self.content))
+      return "Concentration({0} M, {1})".format(format_amount(self.value), repr(self.content))
@@ -0,0 +1,75 @@
+try:
+   from time import perf_counter as clock
+except ImportError:
+   from time import time as clock
+
+class Instrumentation(object):
+   # Counters, gauges and timings for the hot paths. Every hook first checks
+   # 'enabled', so leaving it switched off costs a single attribute test.
+   # Listeners receive each event as it happens, for forwarding to a metrics
+   # system; snapshot() gives the accumulated totals.
+   def __init__(self, enabled=False):
+      self.__enabled = enabled
+      self.__counters = {}
+      self.__gauges = {}
+      self.__timings = {}
+      self.__listeners = []
+
+   @property
+   def enabled(self):
+      return self.__enabled
+
+   @enabled.setter
+   def enabled(self, enabled):
+      self.__enabled = enabled
+
+   def subscribe(self, listener):
+      self.__listeners.append(listener)
+      return listener
+
+   def unsubscribe(self, listener):
+      self.__listeners.remove(listener)
+
+   def count(self, name, n=1):
+      self.__counters[name] = self.__counters.get(name, 0) + n
+
+      for f in self.__listeners:
+         f(name, n)
+
+   def gauge(self, name, value):
+      # Gauges keep the largest value seen, e.g. the deepest recursion.
+      if value > self.__gauges.get(name, value - 1):
+         self.__gauges[name] = value
+
+      for f in self.__listeners:
+         f(name, value)
+
+   def observe(self, name, seconds):
+      timing = self.__timings.get(name)
+
+      if timing is None:
+         timing = self.__timings[name] = [0, 0.0, 0.0]
+
+      timing[0] += 1
+      timing[1] += seconds
+      timing[2] = max(timing[2], seconds)
+
+      for f in self.__listeners:
+         f(name, seconds)
+
+   def snapshot(self):
+      return {
+         "counters": dict(self.__counters),
+         "gauges": dict(self.__gauges),
+         "timings": dict((k, {"calls": v[0], "total": v[1], "max": v[2]}) for (k, v) in self.__timings.items())
+      }
+
+   def reset(self):
+      self.__counters.clear()
+      self.__gauges.clear()
+      self.__timings.clear()
+
+   def __repr__(self):
+      return "Instrumentation({0}, {1} counters, {2} gauges, {3} timings)".format("enabled" if self.enabled else "disabled", len(self.__counters), len(self.__gauges), len(self.__timings))
+
+instrumentation = Instrumentation()
@@ -0,0 +1,203 @@
+from Chem.batch import map_ordered
+from Chem.unit import parse_equation, balance_cache
+import argparse
+import json
+import os
+import sqlite3
+import sys
+
+Schema = "CREATE TABLE IF NOT EXISTS balances (signature TEXT PRIMARY KEY, ratios TEXT NOT NULL)"
+
+def encode(signature):
+   return json.dumps(signature, separators=(",", ":"))
+
+def decode(signature):
+   return tuple((side, str(kind), tuple(tuple(x) for x in composition), charge) for (side, kind, composition, charge) in json.loads(signature))
+
+class BalanceStore(object):
+   # Balanced coefficients kept in an SQLite file, keyed by the equation
+   # signature, so results survive the process and are shared by every
+   # worker on the machine. The database runs in WAL mode, readers never wait
+   # for a writer, and writes are buffered and committed 'batch' at a time.
+   # Unbalanceable reactions are stored too, as an empty tuple.
+   def __init__(self, path, batch=256, timeout=30.0):
+      if batch <= 0:
+         raise ValueError("'batch' cannot be negative or zero")
+
+      self.__path = path
+      self.__batch = batch
+      self.__timeout = timeout
+      self.__connection = None
+      self.__pid = None
+      self.__pending = {}
+      self.__hits = 0
+      self.__misses = 0
+
+   @property
+   def path(self):
+      return self.__path
+
+   @property
+   def hits(self):
+      return self.__hits
+
+   @property
+   def misses(self):
+      return self.__misses
+
+   def __connect(self):
+      # A connection cannot cross a fork, so each process opens its own. Rows
+      # buffered by the parent belong to the parent and are dropped here.
+      if self.__pid != os.getpid():
+         self.__connection = sqlite3.connect(self.__path, timeout=self.__timeout, isolation_level=None)
+         self.__connection.execute("PRAGMA journal_mode=WAL")
+         self.__connection.execute("PRAGMA synchronous=NORMAL")
+         self.__connection.execute(Schema)
+         self.__pid = os.getpid()
+         self.__pending = {}
+
+      return self.__connection
+
+   def get(self, signature):
+      key = encode(signature)
+      connection = self.__connect()
+      value = self.__pending.get(key)
+
+      if value is None:
+         row = connection.execute("SELECT ratios FROM balances WHERE signature = ?", (key,)).fetchone()
+         value = row[0] if row else None
+
+      if value is None:
+         self.__misses += 1
+         return None
+
+      self.__hits += 1
+      return tuple(json.loads(value))
+
+   def put(self, signature, ratios):
+      self.__connect()
+      self.__pending[encode(signature)] = json.dumps(list(ratios))
+
+      if len(self.__pending) >= self.__batch:
+         self.flush()
+
+   def flush(self):
+      if not self.__pending or self.__pid != os.getpid():
+         return
+
+      connection = self.__connect()
+      connection.execute("BEGIN IMMEDIATE")
+
+      try:
+         # The first writer of a signature wins, every solver gives the same
+         # coefficients anyway.
+         connection.executemany("INSERT OR IGNORE INTO balances VALUES (?, ?)", self.__pending.items())
+         connection.execute("COMMIT")
+      except:
+         connection.execute("ROLLBACK")
+         raise
+
+      self.__pending = {}
+
+   def close(self):
+      if self.__pid == os.getpid():
+         self.flush()
+         self.__connection.close()
+
+      self.__connection = None
+      self.__pid = None
+
+   def __iter__(self):
+      self.flush()
+
+      for (signature, ratios) in self.__connect().execute("SELECT signature, ratios FROM balances ORDER BY signature"):
+         yield (decode(signature), tuple(json.loads(ratios)))
+
+   def __len__(self):
+      self.flush()
+      return self.__connect().execute("SELECT COUNT(*) FROM balances").fetchone()[0]
+
+   def export(self, f):
+      # One JSON record per line, sorted, so exports of the same store diff
+      # cleanly.
+      count = 0
+
+      for (signature, ratios) in self:
+         f.write(json.dumps({"signature": signature, "ratios": ratios}, sort_keys=True, separators=(",", ":")))
+         f.write("\n")
+         count += 1
+
+      return count
+
+   def load(self, f):
+      count = 0
+
+      for line in f:
+         if line.strip():
+            record = json.loads(line)
+            self.put(decode(json.dumps(record["signature"])), record["ratios"])
+            count += 1
+
+      self.flush()
+      return count
+
+   def __enter__(self):
+      return self
+
+   def __exit__(self, *args):
+      self.close()
+
+   def __repr__(self):
+      return "BalanceStore('{0}', {1} hits, {2} misses)".format(self.__path, self.__hits, self.__misses)
+
+def _warm(line, method):
+   try:
+      parse_equation(line).balance(method=method)
+      return True
+   except Exception:
+      return False
+
+def _lines(f):
+   for line in f:
+      line = line.strip()
+
+      if line and not line.startswith("#"):
+         yield line
+
+def main(argv=None):
+   parser = argparse.ArgumentParser(prog="python -m Chem.store", description="Maintains a persistent balance store.")
+   parser.add_argument("command", choices=("warm", "export", "import"), help="'warm' balances the reactions of a file into the store, 'export' and 'import' copy the store as JSON lines")
+   parser.add_argument("database", help="SQLite file of the store")
+   parser.add_argument("file", nargs="?", default="-", help="file to read or write, '-' for stdin or stdout")
+   parser.add_argument("-w", "--workers", type=int, default=1, help="number of worker processes for 'warm'")
+   parser.add_argument("--chunksize", type=int, default=256, help="reactions handed to a worker at a time")
+   parser.add_argument("--method", default="nullspace", help="balancing method")
+   args = parser.parse_args(argv)
+
+   store = BalanceStore(args.database)
+
+   if args.command == "export":
+      f = sys.stdout if args.file == "-" else open(args.file, "w")
+   else:
+      f = sys.stdin if args.file == "-" else open(args.file)
+
+   try:
+      if args.command == "warm":
+         balance_cache.store = store
+         results = list(map_ordered(_warm, _lines(f), (args.method,), args.workers, args.chunksize))
+         store.flush()
+         sys.stderr.write("{0} reactions, {1} balanced\n".format(len(results), sum(results)))
+      elif args.command == "export":
+         sys.stderr.write("{0} entries exported\n".format(store.export(f)))
+      else:
+         sys.stderr.write("{0} entries imported\n".format(store.load(f)))
+   finally:
+      store.close()
+
+      if f not in (sys.stdin, sys.stdout):
+         f.close()
+
+   return 0
+
+if __name__ == "__main__":
+   sys.exit(main())
@@ -0,0 +1,87 @@
+from element import Molecule
+import numpy
+
+class TitrationPoints:
+   def __init__(self, volumes, concentrations, remaining, excess):
+      self.__volumes = volumes
+      self.__concentrations = concentrations
+      self.__remaining = remaining
+      self.__excess = excess
+
+   @property
+   def volumes(self):
+      return self.__volumes
+
+   @property
+   def concentrations(self):
+      return self.__concentrations
+
+   @property
+   def remaining(self):
+      return self.__remaining
+
+   @property
+   def excess(self):
+      return self.__excess
+
+   def __getitem__(self, molecule):
+      return self.__concentrations[Molecule(molecule)]
+
+   def __repr__(self):
+      return "TitrationPoints({0} volumes, {1})".format(len(self.volumes), ", ".join(str(x) for x in self.concentrations))
+
+class Titration:
+   # Simulates adding a strong titrant to a sample. The titrant consumes the
+   # 'target' species of the equation one to one, exactly like converting
+   # titrant moles with Moles.to() before building a Sieve, and every other
+   # species follows by its stoichiometric ratio until the analyte runs out.
+   def __init__(self, equation, analyte, titrant, target=None):
+      if not equation:
+         raise ValueError("Equation '{0}' is not valid".format(str(equation)))
+
+      target = Molecule(target) if target is not None else titrant.content.molecule
+
+      for x in (analyte.content.molecule, target):
+         if not equation[x]:
+            raise ValueError("'{0}' does not take part in '{1}'".format(str(x), str(equation)))
+
+      self.__ratios = dict((k, float(v.unit.ratio)) for (k, v) in equation.units.items())
+      self.__target = target
+      self.__molarity = float(titrant.value)
+
+      # A trailing axis is added so a vector of samples broadcasts against
+      # the volume grid, giving one curve per sample.
+      ratio = self.__ratios[analyte.content.molecule]
+      self.__sample = numpy.asarray(analyte.size, dtype=numpy.float64)[..., None]
+      self.__analyte = numpy.asarray(analyte.content.moles.value, dtype=numpy.float64)[..., None]
+      self.__analyte_ratio = ratio
+      self.__extent = self.__analyte / ratio
+
+   @property
+   def target(self):
+      return self.__target
+
+   @property
+   def equivalence(self):
+      return (self.__extent * self.__ratios[self.__target] / self.__molarity)[..., 0]
+
+   def sweep(self, volumes, chunksize=4096):
+      if chunksize <= 0:
+         raise ValueError("'chunksize' cannot be negative or zero")
+
+      volumes = numpy.asarray(volumes, dtype=numpy.float64)
+      target = self.__ratios[self.__target]
+
+      # Only one chunk of the grid is materialized at a time, so memory
+      # stays flat however many volumes are swept.
+      for i in range(0, len(volumes), chunksize):
+         v = volumes[i:i + chunksize]
+         added = v * self.__molarity
+         extent = numpy.minimum(added / target, self.__extent)
+         total = self.__sample + v
+
+         concentrations = dict((k, ratio * extent / total) for (k, ratio) in self.__ratios.items())
+         remaining = (self.__analyte - self.__analyte_ratio * extent) / total
+         excess = (added - target * extent) / total
+
+         yield TitrationPoints(v, concentrations, remaining, excess)
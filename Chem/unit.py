@@ -1,6 +1,8 @@
-from element import Molecule
-from collections import Counter
-from itertools import izip_longest, chain
+from element import Molecule, KnownElement
+from collections import Counter, OrderedDict
+import re
+from itertools import chain, islice, product
+from stats import instrumentation, clock
 
 class Unit:
    def __init__(self, molecule, ratio=1):
@@ -15,8 +17,12 @@ class Unit:
    def ratio(self):
       return self.__ratio
 
+   @property
+   def composition(self):
+      return tuple((z, n * self.ratio) for (z, n) in self.molecule.composition)
+
    def __hash__(self):
-      return hash(tuple(self))
+      return hash((self.ratio, self.molecule))
    
    def __iter__(self):
       for i in range(0, self.ratio):
@@ -90,62 +96,280 @@ class Product:
    def __repr__(self):
       return "Product({0})".format(repr(self.unit))
       
-class CompoundReagent(Reagent):
-   def __init__(self, lhs, rhs):
-      self.__lhs = lhs
-      self.__rhs = rhs
+class Compound:
+   # One side of an equation as a flat list of species. Sides built with '+'
+   # share their list as long as nobody else has appended to it, so adding
+   # a species is amortized O(1) while every side still behaves immutably.
+   def __init__(self, *args):
+      items = []
+
+      for x in args:
+         if isinstance(x, Compound):
+            items.extend(x.species)
+         else:
+            items.append(x)
+
+      self.__share(items, len(items))
+
+   def __share(self, items, count):
+      self.__items = items
+      self.__count = count
+
+   def __view(self, count):
+      compound = self.__class__()
+      compound.__share(self.__items, count)
+      return compound
 
    @property
    def unit(self):
       return None
 
+   @property
+   def species(self):
+      return tuple(islice(self.__items, 0, self.__count))
+
    @property
    def left(self):
-      return self.__lhs
+      if self.__count == 2:
+         return self.__items[0]
+
+      return self.__view(self.__count - 1)
       
    @property
    def right(self):
-      return self.__rhs
+      return self.__items[self.__count - 1]
+
+   def __add__(self, x):
+      if not isinstance(x, self._side):
+         return NotImplemented
+
+      if isinstance(x, Compound) or len(self.__items) != self.__count:
+         return self.__class__(self, x)
+
+      self.__items.append(x)
+      return self.__view(self.__count + 1)
+
+   def __len__(self):
+      return self.__count
 
    def __iter__(self):
-      return chain(iter(self.left), iter(self.right))
+      for x in islice(self.__items, 0, self.__count):
+         for y in x:
+            yield y
       
    def __str__(self):
-      return "{0} + {1}".format(str(self.left), str(self.right))
+      return " + ".join(str(x) for x in self.species)
       
    def __repr__(self):
-      return "{0} + {1}".format(repr(self.left), repr(self.right))
+      return " + ".join(repr(x) for x in self.species)
+
+class CompoundReagent(Compound, Reagent):
+   _side = Reagent
+
+class CompoundProduct(Compound, Product):
+   _side = Product
+
+def make_side(compound, units):
+   if len(units) == 1:
+      return units[0]
+
+   return compound(*units)
+
+_equation_patterns = None
+
+def _equation_grammar():
+   global _equation_patterns
+
+   if _equation_patterns is None:
+      _equation_patterns = (
+         re.compile(u"\\s*(?:->|=>|=|\xe2\x86\x92|\u2192)\\s*"),
+         re.compile(r"\s+\+\s+"),
+         re.compile(r"(\d*)\s*(.+)$")
+      )
+
+   return _equation_patterns
+
+def parse_equation(text):
+   # Reads "CH4 + 2O2 -> CO2 + 2H2O". Species are separated by a '+' with
+   # white space around it, so charges such as "Mg+ + OH-" stay unambiguous.
+   (arrow, plus, coefficient) = _equation_grammar()
+   sides = arrow.split(text.strip())
 
-class CompoundProduct(Product):
-   def __init__(self, lhs, rhs):
-      self.__lhs = lhs
-      self.__rhs = rhs
+   if len(sides) != 2:
+      raise ValueError("Expected one arrow in equation '{0}'".format(text.strip()))
+
+   units = []
+
+   for (unit, compound, side) in ((Reagent, CompoundReagent, sides[0]), (Product, CompoundProduct, sides[1])):
+      species = []
+
+      for x in plus.split(side):
+         match = coefficient.match(x)
+
+         if not match:
+            raise ValueError("Missing species in equation '{0}'".format(text.strip()))
+
+         species.append(unit(Molecule(match.group(2)), int(match.group(1) or 1)))
+
+      units.append(make_side(compound, species))
+
+   return Equation(units[0], units[1])
+
+class BalanceCache(object):
+   def __init__(self, capacity=4096, store=None):
+      self.__capacity = capacity
+      self.__store = store
+      self.__entries = OrderedDict()
+      self.__hits = 0
+      self.__misses = 0
+      self.__evictions = 0
 
    @property
-   def unit(self):
-      return None
+   def capacity(self):
+      return self.__capacity
+
+   @capacity.setter
+   def capacity(self, capacity):
+      if capacity < 0:
+         raise ValueError("'capacity' cannot be negative")
+
+      self.__capacity = capacity
+      self.__evict()
 
    @property
-   def left(self):
-      return self.__lhs
-      
+   def store(self):
+      return self.__store
+
+   @store.setter
+   def store(self, store):
+      # A persistent store behind the cache, see Chem.store. Entries missing
+      # in memory are looked up there and new results are written through.
+      self.__store = store
+
    @property
-   def right(self):
-      return self.__rhs
-      
-   def __iter__(self):
-      return chain(iter(self.left), iter(self.right))
-      
-   def __str__(self):
-      return "{0} + {1}".format(str(self.left), str(self.right))
+   def hits(self):
+      return self.__hits
+
+   @property
+   def misses(self):
+      return self.__misses
+
+   @property
+   def evictions(self):
+      return self.__evictions
+
+   def get(self, signature):
+      try:
+         value = self.__entries.pop(signature)
+      except KeyError:
+         self.__misses += 1
+
+         if instrumentation.enabled:
+            instrumentation.count("balance_cache.misses")
+
+         if self.__store is None:
+            return None
+
+         value = self.__store.get(signature)
+
+         if value is not None:
+            self.__entries[signature] = value
+            self.__evict()
+
+         return value
+
+      # Re-inserting moves the entry to the most recently used end.
+      self.__entries[signature] = value
+      self.__hits += 1
+
+      if instrumentation.enabled:
+         instrumentation.count("balance_cache.hits")
+
+      return value
+
+   def put(self, signature, value):
+      self.__entries.pop(signature, None)
+      self.__entries[signature] = value
+      self.__evict()
+
+      if self.__store is not None:
+         self.__store.put(signature, value)
+
+   def __evict(self):
+      while len(self.__entries) > self.__capacity:
+         self.__entries.popitem(last=False)
+         self.__evictions += 1
+
+         if instrumentation.enabled:
+            instrumentation.count("balance_cache.evictions")
+
+   def clear(self):
+      self.__entries.clear()
+      self.__hits = 0
+      self.__misses = 0
+      self.__evictions = 0
+
+   def __len__(self):
+      return len(self.__entries)
 
    def __repr__(self):
-      return "{0} + {1}".format(repr(self.left), repr(self.right))
+      return "BalanceCache({0}/{1}, hits={2}, misses={3}, evictions={4})".format(len(self), self.capacity, self.hits, self.misses, self.evictions)
+
+balance_cache = BalanceCache()
+
+# Key of the charge in residuals and element columns, next to the elements.
+Charge = "charge"
+
+# How many weightings of the independent reactions a balance may try, when
+# a reaction has more than one, looking for smaller coefficients.
+Budget = 1024
+
+def integer_ratios(basis):
+   # The smallest positive integer coefficients found in the span of a
+   # canonical null space basis, or None when there are none.
+   from linalg import integer_vector, positive_combination, gcd
+
+   if not basis:
+      return None
+
+   if len(basis) == 1:
+      ratios = integer_vector(basis[0])
+      return ratios if all(x > 0 for x in ratios) else None
+
+   # With several independent reactions, the coefficients are a positive
+   # combination of them. A linear program over the rationals decides
+   # exactly whether one exists and gives one with the smallest total
+   # before rounding to integers. Rounding can make it larger than
+   # needed, so small integer weights are tried too and the combination
+   # with the smallest total is kept. Each basis vector is one on its own
+   # free column and zero on the others, so only positive weights work.
+   weights = positive_combination(basis)
+
+   if weights is None:
+      return None
+
+   best = integer_vector([sum(w * x for (w, x) in zip(weights, column)) for column in zip(*basis)])
+   columns = list(zip(*[integer_vector(x) for x in basis]))
+   bound = max(1, int(Budget ** (1.0 / len(basis))))
+
+   for weights in product(range(1, bound + 1), repeat=len(basis)):
+      ratios = [sum(w * x for (w, x) in zip(weights, column)) for column in columns]
+
+      if all(x > 0 for x in ratios):
+         divisor = reduce(gcd, ratios)
+         ratios = [x // divisor for x in ratios]
+
+         if (sum(ratios), ratios) < (sum(best), best):
+            best = ratios
+
+   return best
 
 class Equation:
    def __init__(self, reagent, product):
       self.__reagent = reagent
       self.__product = product
+      self.__index = None
+      self.__solver = None
 
    @property
    def reagent(self):
@@ -154,38 +378,235 @@ class Equation:
    @property
    def product(self):
       return self.__product
+
+   @property
+   def reagents(self):
+      return tuple(self.__species(self.reagent))
+
+   @property
+   def products(self):
+      return tuple(self.__species(self.product))
+
+   @property
+   def units(self):
+      # An equation never changes, so the species lookup is built once and
+      # every later lookup is a single dict hit.
+      if self.__index is None:
+         index = {}
+
+         for x in chain(self.__species(self.reagent), self.__species(self.product)):
+            index.setdefault(x.unit.molecule, x)
+
+         self.__index = index
+
+      return self.__index
    
    def __getitem__(self, molecule):
+      return self.units.get(Molecule(molecule))
+
+   def balance(self, method="nullspace"):
+      enabled = instrumentation.enabled
+
+      if enabled:
+         start = clock()
+
+      if method == "nullspace":
+         eq = self.__balance_incremental() if self.__solver is not None else self.__balance_cached()
+      elif method == "backtrace":
+         eq = self.__balance_backtrace()
+      else:
+         raise ValueError("Unknown balancing method '{0}'".format(method))
+
+      if enabled:
+         instrumentation.observe("equation.balance." + method, clock() - start)
+
+      if not eq:
+         raise Exception("Equation '{0}' cannot be balanced".format(str(self)))
+
+      # The null space solvers keep the species in the same order, so the
+      # balanced equation carries on with any solver state of this one.
+      if method == "nullspace":
+         eq.__solver = self.__solver
+
+      return eq
+
+   def add(self, x):
+      # Gives this equation with one more reagent or product. The null space
+      # of the element matrix is kept with the equation and only updated for
+      # the new species, so edits followed by balance() skip the full solve.
+      (solver, keys) = self.__solver_state()
+      solver = solver.copy()
+      reagents = list(self.__species(self.reagent))
+      products = list(self.__species(self.product))
+      rkeys = keys[:len(reagents)]
+      pkeys = keys[len(reagents):]
+
+      for y in self.__species(x):
+         if isinstance(y, Reagent):
+            reagents.append(y)
+            rkeys.append(solver.add(self.__column(1, y)))
+         else:
+            products.append(y)
+            pkeys.append(solver.add(self.__column(-1, y)))
+
+      return self.__edited(reagents, products, solver, rkeys + pkeys)
+
+   def remove(self, molecule):
       molecule = Molecule(molecule)
-   
-      return self.__find(molecule, self.reagent) or self.__find(molecule, self.product)
-   
-   def __find(self, molecule, x):
-      if isinstance(x, CompoundReagent) or isinstance(x, CompoundProduct):
-         return self.__find(molecule, x.left) or self.__find(molecule, x.right)
-      
-      if (isinstance(x, Product) or isinstance(x, Reagent)) and x.unit.molecule == molecule:
-         return x
-      
-      return None
+      (solver, keys) = self.__solver_state()
+      variables = list(self.__species(self.reagent)) + list(self.__species(self.product))
+      kept = [i for (i, x) in enumerate(variables) if x.unit.molecule != molecule]
+
+      if len(kept) == len(variables):
+         raise ValueError("'{0}' does not take part in '{1}'".format(str(molecule), str(self)))
+
+      solver = solver.copy()
+
+      for (i, key) in enumerate(keys):
+         if i not in kept:
+            solver.remove(key)
+
+      reagents = [variables[i] for i in kept if isinstance(variables[i], Reagent)]
+      products = [variables[i] for i in kept if isinstance(variables[i], Product)]
+      return self.__edited(reagents, products, solver, [keys[i] for i in kept])
+
+   def __edited(self, reagents, products, solver, keys):
+      if not reagents or not products:
+         raise ValueError("Equation needs at least one reagent and one product")
+
+      eq = Equation(make_side(CompoundReagent, reagents), make_side(CompoundProduct, products))
+      eq.__solver = (solver, keys)
+      return eq
+
+   def __column(self, sign, x):
+      molecule = x.unit.molecule
+      column = dict((z, sign * n) for (z, n) in molecule.composition)
+
+      if molecule.charge:
+         column[Charge] = sign * molecule.charge
+
+      return column
+
+   def __solver_state(self):
+      if self.__solver is None:
+         from linalg import IncrementalNullspace
+
+         solver = IncrementalNullspace()
+         keys = [solver.add(self.__column(1, x)) for x in self.__species(self.reagent)]
+         keys.extend(solver.add(self.__column(-1, x)) for x in self.__species(self.product))
+         self.__solver = (solver, keys)
 
-   def balance(self):
+      return self.__solver
+
+   def __species(self, x):
+      if isinstance(x, Compound):
+         return x.species
+
+      if isinstance(x, Reagent) or isinstance(x, Product):
+         return (x,)
+
+      return ()
+
+   def __make_equation(self, units):
+      reagents = [x for x in units if isinstance(x, Reagent)]
+      products = [x for x in units if isinstance(x, Product)]
+
+      if not reagents or not products:
+         return None
+
+      return Equation(make_side(CompoundReagent, reagents), make_side(CompoundProduct, products))
+
+   @property
+   def signature(self):
+      return tuple(sorted(self.__signature_keys()))
+
+   def __signature_keys(self):
+      # A species is identified by its side, its kind (plain molecule or
+      # ion), its element composition and its charge, so the order of '+' is
+      # irrelevant.
+      for (side, x) in ((0, self.reagent), (1, self.product)):
+         for y in self.__species(x):
+            molecule = y.unit.molecule
+            yield (side, molecule.__class__.__name__, molecule.composition, molecule.charge)
+
+   def __balance_cached(self):
+      variables = list(self.__species(self.reagent)) + list(self.__species(self.product))
+      keys = list(self.__signature_keys())
+      order = sorted(range(0, len(keys)), key=keys.__getitem__)
+      signature = tuple(keys[i] for i in order)
+      ratios = balance_cache.get(signature)
+
+      if ratios is None:
+         ratios = self.__solve_nullspace()
+         # Store the coefficients in canonical order, so any permutation of
+         # the same reaction can reuse them.
+         balance_cache.put(signature, tuple(ratios[i] for i in order) if ratios else ())
+      elif ratios:
+         ratios = dict(zip(order, ratios))
+         ratios = [ratios[i] for i in range(0, len(variables))]
+
+      if not ratios:
+         return None
+
+      return self.__make_equation([x.copy(ratio) for (x, ratio) in zip(variables, ratios)])
+
+   def __balance_incremental(self):
+      from linalg import canonical_nullspace
+
+      (solver, keys) = self.__solver
+      variables = list(self.__species(self.reagent)) + list(self.__species(self.product))
+      index = dict((k, i) for (i, k) in enumerate(keys))
+      basis = [dict((index[k], x) for (k, x) in v.items()) for v in solver.basis()]
+      ratios = integer_ratios(canonical_nullspace(basis, len(variables)))
+
+      if not ratios:
+         return None
+
+      return self.__make_equation([x.copy(ratio) for (x, ratio) in zip(variables, ratios)])
+
+   def __solve_nullspace(self):
+      # Exact rational arithmetic pulls in fractions and decimal, which are
+      # only loaded once something actually needs solving.
+      from linalg import nullspace
+
+      reagents = list(self.__species(self.reagent))
+      products = list(self.__species(self.product))
+      variables = reagents + products
+      counts = [dict(x.unit.molecule.composition) for x in variables]
+      signs = [1] * len(reagents) + [-1] * len(products)
+      elements = sorted(set(chain.from_iterable(counts)))
+
+      # Each row conserves one element: reagent atoms minus product atoms
+      # must be zero, so the coefficients live in the null space. Ions add
+      # one more row which conserves the charge.
+      matrix = [[s * c.get(e, 0) for (s, c) in zip(signs, counts)] for e in elements]
+      charges = [x.unit.molecule.charge for x in variables]
+
+      if any(charges):
+         matrix.append([s * q for (s, q) in zip(signs, charges)])
+      return integer_ratios(nullspace(matrix, len(variables)))
+
+   def __balance_backtrace(self):
       variables = []
       variable_set = set()
       domain = set()
+      explored = [0]
+      pruned = [0]
+      depth = [0]
    
       def collector(x):
-         if isinstance(x, CompoundReagent) or isinstance(x, CompoundProduct):
-            collector(x.left)
-            collector(x.right)
-            return
-         
-         if isinstance(x, Reagent) or isinstance(x, Product):
-            variables.append(x)
-            domain.add(x.unit.ratio)
-            domain.update(Counter(x).values())
+         for y in self.__species(x):
+            variables.append(y)
+            domain.add(y.unit.ratio)
+            domain.update(Counter(y).values())
+
+            # Charges are what redox coefficients are made of.
+            if y.unit.molecule.charge:
+               domain.add(abs(y.unit.molecule.charge))
       
       def backtrace(assignment):
+         explored[0] += 1
+         depth[0] = max(depth[0], len(assignment))
          eq = make_equation_for_assignment(assignment)
       
          if eq:
@@ -203,36 +624,50 @@ class Equation:
                if result:
                   return result
 
+         pruned[0] += 1
          return None
       
       def make_equation_for_assignment(assignment):
-         units = [variable.copy(ratio) for (k, variable, ratio) in assignment]
-         reagents = [x for x in units if isinstance(x, Reagent)]
-         products = [x for x in units if isinstance(x, Product)]
-         
-         if not reagents or not products:
-            return None
-
-         return Equation(reduce(CompoundReagent, reagents), reduce(CompoundProduct, products))
+         return self.__make_equation([variable.copy(ratio) for (k, variable, ratio) in assignment])
       
       collector(self.reagent)
       collector(self.product)
       
       variable_set.update(x for x in range(0, len(variables)))
-      
       eq = backtrace([])
-      
-      if not eq:
-         raise Exception("Equation '{0}' cannot be balanced".format(str(self)))
+
+      if instrumentation.enabled:
+         instrumentation.count("equation.backtrace.explored", explored[0])
+         instrumentation.count("equation.backtrace.pruned", pruned[0])
+         instrumentation.gauge("equation.backtrace.depth", depth[0])
+         instrumentation.gauge("equation.backtrace.domain", len(domain))
       
       return eq
 
-   def __bool__(self):
-      for (x, y) in izip_longest(sorted(self.reagent), sorted(self.product)):
-         if not x or not y or x != y:
-            return False
+   def residual(self):
+      # Reagent atoms minus product atoms for every element involved, worked
+      # out on counts so large coefficients never expand into atom lists.
+      # With ions taking part, the charge imbalance is given as "charge".
+      counts = {}
+      charge = None
+
+      for (sign, x) in ((1, self.reagent), (-1, self.product)):
+         for y in self.__species(x):
+            for (z, n) in y.unit.composition:
+               counts[z] = counts.get(z, 0) + sign * n
+
+            if y.unit.molecule.charge:
+               charge = (charge or 0) + sign * y.unit.ratio * y.unit.molecule.charge
 
-      return True
+      result = dict((KnownElement(z), n) for (z, n) in counts.items())
+
+      if charge is not None:
+         result[Charge] = charge
+
+      return result
+
+   def __bool__(self):
+      return not any(self.residual().values())
 
    def __nonzero__(self):
       return self.__bool__()
@@ -0,0 +1,27 @@
+from Chem.unit import parse_equation
+import unittest
+
+class BalanceTest(unittest.TestCase):
+   def check(self, text, expected):
+      self.assertEqual(str(parse_equation(text).balance()), expected)
+
+   def test_single_reaction(self):
+      self.check("H2 + O2 -> H2O", "2H2 + O2 -> 2H2O")
+
+   def test_several_reactions(self):
+      self.check("Cu + HNO3 -> Cu(NO3)2 + NO + NO2 + H2O", "2Cu + 6HNO3 -> 2CuN2O6 + NO + NO2 + 3H2O")
+      self.check("KMnO4 + H2O2 + H2SO4 -> K2SO4 + MnSO4 + O2 + H2O", "2KMnO4 + H2O2 + 3H2SO4 -> K2SO4 + 2MnSO4 + 3O2 + 4H2O")
+
+   def test_large_coefficients(self):
+      self.check("O2 + CH3OH -> CO2 + H2 + C16H34", "O2 + 34CH4O -> 18CO2 + 51H2 + C16H34")
+      self.check("O2 + C12H22O11 -> CO + H2 + C8H18", "O2 + 10C12H22O11 -> 112CO + 101H2 + C8H18")
+      self.check("C + H2O2 -> CH3OH + C16H34 + O3", "51C + 57H2O2 -> 3CH4O + 3C16H34 + 37O3")
+
+   def test_unbalanceable(self):
+      self.assertRaises(Exception, parse_equation("NaCl -> Na + Cl2 + H2").balance)
+
+   def test_smallest_total(self):
+      self.check("C + O2 -> CO + CO2", "3C + 2O2 -> 2CO + CO2")
+
+if __name__ == "__main__":
+   unittest.main()
@@ -0,0 +1,31 @@
+from Chem.unit import parse_equation
+import unittest
+
+try:
+   import numpy
+   from Chem.equilibrium import Equilibrium
+except ImportError:
+   numpy = None
+
+@unittest.skipIf(numpy is None, "NumPy is not installed")
+class EquilibriumTest(unittest.TestCase):
+   def check(self, equilibrium, K, initial):
+      result = equilibrium.solve(K, initial)
+      Q = equilibrium.quotient(result.concentrations)
+      self.assertTrue(result.converged.all())
+      self.assertTrue(numpy.allclose(numpy.log(Q), numpy.log(K), rtol=0, atol=1e-8))
+
+   def test_single_point(self):
+      equilibrium = Equilibrium(parse_equation("Mg(OH)2 -> Mg^2+ + OH-").balance(), exclude=["Mg(OH)2"])
+      self.check(equilibrium, 0.010038758734856289, {"OH-": 1e-3})
+
+   def test_sweep(self):
+      equilibrium = Equilibrium(parse_equation("Mg(OH)2 -> Mg^2+ + OH-").balance(), exclude=["Mg(OH)2"])
+      self.check(equilibrium, numpy.logspace(-20, 2, 20000), {"OH-": 1e-3})
+
+   def test_sweep_both_sides(self):
+      equilibrium = Equilibrium(parse_equation("N2O4 -> NO2").balance())
+      self.check(equilibrium, numpy.logspace(-12, 6, 20000), {"N2O4": 0.1, "NO2": 0.01})
+
+if __name__ == "__main__":
+   unittest.main()
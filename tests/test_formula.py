@@ -0,0 +1,34 @@
+from Chem import Molecule, Cation, Anion, Elements
+from Chem.unit import parse_equation
+import unittest
+
+class ChargeSuffixTest(unittest.TestCase):
+   def check(self, formula, composition, charge, text):
+      molecule = Molecule(formula)
+      self.assertEqual(molecule.composition, tuple(sorted((Elements[k].Z, n) for (k, n) in composition)))
+      self.assertEqual(molecule.charge, charge)
+      self.assertEqual(str(molecule), text)
+      self.assertEqual(Molecule(str(molecule)), molecule)
+
+   def test_count_before_sign(self):
+      self.check("NH4+", [("N", 1), ("H", 4)], 1, "NH4+")
+      self.check("NO3-", [("N", 1), ("O", 3)], -1, "NO3-")
+      self.check("MnO4-", [("Mn", 1), ("O", 4)], -1, "MnO4-")
+      self.check("HCO3-", [("H", 1), ("C", 1), ("O", 3)], -1, "HCO3-")
+
+   def test_charge_count(self):
+      self.check("Fe^3+", [("Fe", 1)], 3, "Fe^3+")
+      self.check("Fe+3", [("Fe", 1)], 3, "Fe^3+")
+      self.check("SO4^2-", [("S", 1), ("O", 4)], -2, "SO4^2-")
+      self.check("SO4--", [("S", 1), ("O", 4)], -2, "SO4^2-")
+
+   def test_kind(self):
+      self.assertTrue(isinstance(Molecule("NH4+"), Cation))
+      self.assertTrue(isinstance(Molecule("SO4^2-"), Anion))
+
+   def test_ionic_equation(self):
+      eq = parse_equation("NH4+ + OH- -> NH3 + H2O").balance()
+      self.assertEqual(str(eq), "NH4+ + OH- -> NH3 + H2O")
+
+if __name__ == "__main__":
+   unittest.main()
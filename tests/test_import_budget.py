@@ -0,0 +1,18 @@
+from Chem.benchmarks import Budgets, measure_import
+import os
+import unittest
+
+# Wall clock limits only mean something on a quiet machine, so the check
+# runs when asked for, e.g. CHEM_BENCHMARKS=1 on a dedicated runner.
+@unittest.skipUnless(os.environ.get("CHEM_BENCHMARKS"), "set CHEM_BENCHMARKS=1 to check the import budgets")
+class ImportBudgetTest(unittest.TestCase):
+   # ImportProbe runs in fresh interpreters, so this holds whatever the
+   # other tests have imported already.
+   def test_import_budget(self):
+      results = measure_import()
+
+      for (key, budget) in sorted(Budgets.items()):
+         self.assertLessEqual(results[key], budget, "'{0}' took {1:.4f} s, over its budget of {2} s".format(key, results[key], budget))
+
+if __name__ == "__main__":
+   unittest.main()
@@ -0,0 +1,77 @@
+from Chem import Molecule
+from Chem.unit import parse_equation, Reagent, Product, balance_cache
+from Chem.linalg import IncrementalNullspace, canonical_nullspace, nullspace
+import random
+import unittest
+
+Pool = ["H2", "O2", "H2O", "CO2", "CH4", "C2H6", "CO", "H2O2", "C", "N2", "NH3", "NO", "NO2", "HNO3", "C3H8", "O3", "Fe^2+", "Fe^3+", "Cu", "Cu^2+", "H+", "OH-"]
+
+def full(eq):
+   balance_cache.clear()
+
+   try:
+      return str(parse_equation(str(eq)).balance())
+   except Exception:
+      return None
+
+def incremental(eq):
+   try:
+      return str(eq.balance())
+   except Exception:
+      return None
+
+class IncrementalNullspaceTest(unittest.TestCase):
+   def test_random_columns(self):
+      # After any sequence of additions and removals the basis spans the
+      # same null space as a solve of the remaining columns from scratch.
+      rng = random.Random(1)
+
+      for trial in range(0, 200):
+         solver = IncrementalNullspace()
+         columns = {}
+
+         for step in range(0, 12):
+            if columns and rng.random() < 0.35:
+               key = rng.choice(sorted(columns))
+               solver.remove(key)
+               del columns[key]
+            else:
+               column = dict((r, rng.randint(-3, 3)) for r in rng.sample(range(0, 4), rng.randint(1, 3)))
+               columns[solver.add(column)] = column
+
+            keys = sorted(columns)
+            index = dict((k, i) for (i, k) in enumerate(keys))
+            basis = [dict((index[k], x) for (k, x) in v.items()) for v in solver.basis()]
+            matrix = [[columns[k].get(r, 0) for k in keys] for r in range(0, 4)]
+            self.assertEqual(canonical_nullspace(basis, len(keys)), nullspace(matrix, len(keys)))
+
+class IncrementalBalanceTest(unittest.TestCase):
+   def test_random_edits(self):
+      # Equations edited with add() and remove() balance exactly like the
+      # same equation parsed and solved from scratch.
+      rng = random.Random(3)
+
+      for trial in range(0, 300):
+         eq = parse_equation("{0} -> {1}".format(rng.choice(Pool), rng.choice(Pool)))
+
+         for step in range(0, 8):
+            variables = list(eq.reagents) + list(eq.products)
+
+            if len(variables) > 2 and rng.random() < 0.3:
+               try:
+                  eq = eq.remove(rng.choice(variables).unit.molecule)
+               except ValueError:
+                  # The last reagent or product cannot go.
+                  continue
+            else:
+               molecule = Molecule(rng.choice(Pool))
+               eq = eq.add(Reagent(molecule) if rng.random() < 0.5 else Product(molecule))
+
+            result = incremental(eq)
+            self.assertEqual(result, full(eq), str(eq))
+
+            if result and rng.random() < 0.5:
+               eq = eq.balance()
+
+if __name__ == "__main__":
+   unittest.main()
@@ -0,0 +1,17 @@
+from Chem.element import Isotopes, PeriodicTable
+import unittest
+
+class IsotopeTableTest(unittest.TestCase):
+   def test_complete(self):
+      # Tc, Pm and Po to Ac have no stable isotope and no natural composition.
+      missing = [PeriodicTable[z]["Symbol"] for z in range(1, 93) if z not in Isotopes]
+      self.assertEqual(missing, ["Tc", "Pm", "Po", "At", "Rn", "Fr", "Ra", "Ac"])
+
+   def test_abundances(self):
+      for (z, isotopes) in Isotopes.items():
+         self.assertAlmostEqual(sum(x[2] for x in isotopes), 1.0, places=3)
+         mass = sum(x[1] * x[2] for x in isotopes)
+         self.assertAlmostEqual(mass, PeriodicTable[z]["AtomicWeight"], delta=0.02)
+
+if __name__ == "__main__":
+   unittest.main()
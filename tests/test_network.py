@@ -0,0 +1,49 @@
+from Chem.unit import parse_equation
+from Chem.network import ReactionNetwork
+import unittest
+
+def network(*equations):
+   return ReactionNetwork([parse_equation(x) for x in equations])
+
+class ConservedMoietiesTest(unittest.TestCase):
+   def moieties(self, *equations):
+      return sorted(sorted((str(k), n) for (k, n) in x.items()) for x in network(*equations).conserved_moieties())
+
+   def check(self, net, count):
+      moieties = net.conserved_moieties()
+      self.assertEqual(len(moieties), count)
+
+      for moiety in moieties:
+         self.assertTrue(all(n > 0 for n in moiety.values()))
+
+         for eq in net:
+            before = sum(x.unit.ratio * moiety.get(x.unit.molecule, 0) for x in eq.reagents)
+            after = sum(x.unit.ratio * moiety.get(x.unit.molecule, 0) for x in eq.products)
+            self.assertEqual(before, after)
+
+   def test_elements(self):
+      self.assertEqual(self.moieties("2NO + O2 -> 2NO2", "2NO2 -> N2O4"), [
+         [("N2O4", 2), ("NO", 1), ("NO2", 1)],
+         [("N2O4", 4), ("NO", 1), ("NO2", 2), ("O2", 2)]])
+
+   def test_one_per_dimension(self):
+      self.check(network("CH4 + 2O2 -> CO2 + 2H2O"), 3)
+
+   def test_unbalanced(self):
+      # No element is conserved, the laws come from the linear programs.
+      self.assertEqual(self.moieties("H2 + O2 -> H2O"), [[("H2", 1), ("H2O", 1)], [("H2O", 1), ("O2", 1)]])
+      self.check(network("H2 + O2 -> H2O", "H2O -> OH + H"), 3)
+
+class BalanceTest(unittest.TestCase):
+   def test_same_as_equation(self):
+      equations = ["CH4 + O2 -> CO2 + H2O", "Cu + HNO3 -> Cu(NO3)2 + NO + NO2 + H2O", "MnO4- + Fe^2+ + H+ -> Mn^2+ + Fe^3+ + H2O", "NO + O2 -> NO2", "2H2 + O2 -> 2H2O"]
+      balanced = network(*equations).balance()
+      self.assertEqual([str(x) for x in balanced], [str(parse_equation(x).balance()) for x in equations])
+      self.assertFalse(balanced.inconsistent())
+
+   def test_unbalanceable(self):
+      balanced = network("NaCl -> Na + Cl2 + H2", "H2 + O2 -> H2O").balance()
+      self.assertEqual([j for (j, eq, residual) in balanced.inconsistent()], [0])
+
+if __name__ == "__main__":
+   unittest.main()